@@ -1,5 +1,6 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
+from components.session import current_user, end_session
 
 # -------------------------------
 # Configuration de la page
@@ -9,10 +10,8 @@ st.set_page_config(page_title="Tableau de bord", page_icon="📊", layout="wide"
 # -------------------------------
 # Vérification d'authentification
 # -------------------------------
-if "authenticated" not in st.session_state:
-    st.session_state["authenticated"] = False
-
-if not st.session_state["authenticated"]:
+# jeton de session signé vérifié localement (pas de lecture Firestore)
+if current_user() is None:
     st.warning("⚠️ Veuillez vous connecter d'abord.")
     st.switch_page("pages/Login.py")
     st.stop()
@@ -76,6 +75,6 @@ elif selected == "👥 Utilisateurs":
     st.switch_page("pages/Admin.py")
 
 elif selected == "🔒 Déconnexion":
-    st.session_state["authenticated"] = False
+    end_session()
     st.info("✅ Déconnecté")
     st.switch_page("pages/Login.py")
@@ -0,0 +1,44 @@
+"""
+Comparaison des moteurs PDF (xhtml2pdf vs reportlab).
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_engines --items 1 20 100 --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.synthetic import synthetic_invoice
+from components.pdf_backends import BACKENDS
+
+
+def bench(engine, data, type_doc, repeat):
+    backend = BACKENDS[engine]
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf_bytes = backend.render(data, type_doc, use_cache=False)
+        timings.append(time.perf_counter() - start)
+        size = len(pdf_bytes or b"")
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 20, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'document':<18}{'lignes':>8}{'moteur':>12}{'médiane (ms)':>15}{'taille (Ko)':>13}")
+    for type_doc in ("Facture de doit", "Reçu de Paiement"):
+        sizes = args.items if type_doc == "Facture de doit" else [0]
+        for n in sizes:
+            data = synthetic_invoice(n)
+            for engine in BACKENDS:
+                median, size = bench(engine, data, type_doc, args.repeat)
+                print(f"{type_doc:<18}{n:>8}{engine:>12}{median * 1000:>15.1f}{size / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
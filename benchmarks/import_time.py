@@ -0,0 +1,132 @@
+"""
+Temps d'import à froid des pages et des modules partagés (démarrage, premier affichage).
+
+Chaque cible est importée dans un interpréteur neuf avec `python -X importtime` :
+aucun module n'est déjà en mémoire, comme au démarrage du serveur. Pour une page,
+on importe les modules de son en-tête (les imports placés avant la première
+instruction) : c'est ce que paie le premier affichage. Le rapport indique aussi
+quelles bibliothèques lourdes ont été chargées au passage.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --top 15 pages/Login.py firebase_admin_setup
+    python -m benchmarks.import_time --budget pages/Login.py=800   # code retour 1 si dépassé
+"""
+import argparse
+import ast
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = [
+    "pages/Login.py",
+    "app.py",
+    "pages/Data_analyse.py",
+    "pages/Dashboard.py",
+    "pages/Previsualisation.py",
+    "pages/Admin.py",
+    "firebase_admin_setup",
+    "firebase_utils",
+]
+# millisecondes ; modifiables avec --budget cible=ms
+DEFAULT_BUDGETS = {
+    "pages/Login.py": 1500,
+    "app.py": 1500,
+    "firebase_admin_setup": 400,
+}
+# bibliothèques dont la présence au premier affichage est à surveiller
+HEAVY_MODULES = ["pandas", "matplotlib", "xhtml2pdf", "reportlab", "google.cloud.firestore", "grpc"]
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def header_imports(path):
+    """Modules importés en tête d'une page, avant sa première instruction."""
+    tree = ast.parse((ROOT / path).read_text(encoding="utf-8"))
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue  # docstring
+        else:
+            break
+    return modules
+
+
+def measure(modules, baseline=()):
+    """
+    Importe modules dans un interpréteur neuf ; retourne (total ms, {module: cumul ms}, erreur).
+    Les modules de baseline (chargés au lancement de l'interpréteur) ne sont pas comptés.
+    """
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    cumulative, total = {}, 0
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumul, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name in baseline:
+            continue
+        cumulative[name] = max(cumulative.get(name, 0), cumul / 1000)
+        if indent == 1:  # module importé directement (niveau supérieur)
+            total += cumul
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["échec"])[-1]
+    return total / 1000, cumulative, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="pages (chemin .py) ou modules importables")
+    parser.add_argument("--top", type=int, default=5, help="modules les plus coûteux affichés par cible")
+    parser.add_argument("--budget", action="append", default=[], metavar="CIBLE=MS",
+                        help="budget d'import en millisecondes (répétable)")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget:
+        target, _, ms = item.partition("=")
+        budgets[target] = float(ms)
+
+    _, startup, _ = measure([])
+    over = []
+    for target in args.targets:
+        modules = header_imports(target) if target.endswith(".py") else [target]
+        total, cumulative, error = measure(modules, baseline=startup)
+        budget = budgets.get(target)
+        verdict = ""
+        if error:
+            verdict = "  ⚠️ non mesurable"
+        elif budget is not None:
+            verdict = f"  ✅ budget {budget:.0f} ms" if total <= budget else f"  ❌ budget {budget:.0f} ms dépassé"
+            if total > budget:
+                over.append(target)
+        print(f"{target:<28}{total:>9.0f} ms{verdict}")
+        if error:
+            print(f"    ⚠️ import incomplet : {error}")
+        heavy = [m for m in HEAVY_MODULES if m in cumulative]
+        if heavy:
+            print(f"    lourds : {', '.join(heavy)}")
+        top = sorted(((ms, name) for name, ms in cumulative.items() if "." not in name), reverse=True)
+        for ms, name in top[:args.top]:
+            print(f"    {ms:>9.0f} ms  {name}")
+
+    if over:
+        print(f"❌ Budget dépassé : {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
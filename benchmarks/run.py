@@ -0,0 +1,137 @@
+"""
+Suite de benchmarks : construction HTML, format_number et rendu PDF.
+
+Pour chaque taille de facture, type de document, moteur et profil (print / email),
+mesure le temps de construction du HTML, le temps de rendu PDF (cache désactivé), le pic mémoire
+(tracemalloc, mesuré sur une passe séparée pour ne pas fausser les temps) et la
+taille du PDF. Les résultats sont écrits en JSON.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.run
+    python -m benchmarks.run --items 1 10 100 --repeat 5 --output bench_results.json
+    python -m benchmarks.run --html-max-items 500   # xhtml2pdf est lent au-delà
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+
+from benchmarks.synthetic import synthetic_invoice
+from components.assets import PROFILES
+from components.pdf_backends import BACKENDS
+from components.pdf_generator import build_facture_html, format_number
+
+DEFAULT_ITEMS = [1, 10, 100, 500, 1000, 2000]
+DOCUMENT_TYPES = ["Facture de doit", "Reçu de Paiement"]
+PACKAGES = ["xhtml2pdf", "reportlab", "jinja2", "Pillow"]
+
+
+def _timed(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+    }
+
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_format_number(repeat, n_calls=10_000):
+    values = [i * 1234.5 for i in range(n_calls)]
+    _, timing = _timed(lambda: [format_number(v) for v in values], repeat)
+    return {"benchmark": "format_number", "calls": n_calls, **timing}
+
+
+def bench_document(type_doc, n_items, engine, repeat, profile="print"):
+    data = synthetic_invoice(n_items)
+    backend = BACKENDS[engine]
+
+    html, build_timing = _timed(lambda: build_facture_html(data, type_doc=type_doc, profile=profile), repeat)
+    pdf_bytes, render_timing = _timed(lambda: backend.render(data, type_doc, use_cache=False, profile=profile), repeat)
+    peak = _peak_memory(lambda: backend.render(data, type_doc, use_cache=False, profile=profile))
+
+    return {
+        "benchmark": "document",
+        "type_doc": type_doc,
+        "items": n_items,
+        "engine": engine,
+        "profile": profile,
+        "html_build_ms": build_timing["median_ms"],
+        "html_bytes": len(html or ""),
+        "render_ms": render_timing["median_ms"],
+        "render_min_ms": render_timing["min_ms"],
+        "render_max_ms": render_timing["max_ms"],
+        "peak_memory_bytes": peak,
+        "pdf_bytes": len(pdf_bytes or b""),
+        "ok": bool(pdf_bytes),
+    }
+
+
+def environment():
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "packages": versions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=DEFAULT_ITEMS)
+    parser.add_argument("--engines", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--html-max-items", type=int, default=None,
+                        help="ignore le moteur html au-delà de ce nombre de lignes")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    results = [bench_format_number(args.repeat)]
+    for type_doc in DOCUMENT_TYPES:
+        # le reçu n'a pas de lignes : une seule mesure suffit
+        sizes = args.items if type_doc == "Facture de doit" else [0]
+        for n in sizes:
+            for engine, profile in itertools.product(args.engines, args.profiles):
+                if engine == "html" and args.html_max_items is not None and n > args.html_max_items:
+                    continue
+                row = bench_document(type_doc, n, engine, args.repeat, profile=profile)
+                results.append(row)
+                print(f"{type_doc:<18}{n:>6}{engine:>11}{profile:>7}"
+                      f"  html {row['html_build_ms']:8.1f} ms"
+                      f"  pdf {row['render_ms']:9.1f} ms"
+                      f"  pic {row['peak_memory_bytes'] / 1024 / 1024:7.1f} Mo"
+                      f"  {row['pdf_bytes'] / 1024:7.1f} Ko", flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Factures synthétiques déterministes pour les benchmarks (aucun accès réseau)."""
+import random
+
+DESCRIPTIONS = [
+    "Gants d'examen nitrile (boîte de 100)",
+    "Compresses stériles 10x10",
+    "Seringues 5 ml avec aiguille",
+    "Tensiomètre électronique bras",
+    "Blouse médicale taille L",
+    "Article médical — gants, compresses et consommables pour bloc opératoire",
+]
+
+
+def synthetic_invoice(n_items, seed=0):
+    rng = random.Random(seed + n_items)
+    items = [
+        {
+            "description": rng.choice(DESCRIPTIONS),
+            "date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+            "qty": rng.randint(1, 20),
+            "price": float(rng.randrange(500, 250_000, 50)),
+        }
+        for _ in range(n_items)
+    ]
+    total = sum(item["qty"] * item["price"] for item in items)
+    return {
+        "client_name": "Clinique Benchmark",
+        "client_phone": "+223 00 00 00 00",
+        "client_email": "bench@example.com",
+        "items": items,
+        "objet": "Achat de matériel médical",
+        "montant_total": total,
+        "montant_paye": total / 2,
+        "reliquat": total / 2,
+    }
@@ -0,0 +1,89 @@
+"""
+Vérifie les indicateurs calculés par agrégation Firestore (components/factures_stats)
+en les comparant au calcul historique (lecture de toute la collection).
+
+À lancer contre l'émulateur Firestore :
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python check_stats.py --seed 200
+"""
+import argparse
+import os
+import random
+import sys
+
+from firebase_admin_setup import db
+from components.factures_stats import _admin_kpis, _user_kpis
+
+TYPES = ["Facture de doit", "Reçu de Paiement"]
+
+
+def seed(n):
+    rng = random.Random(42)
+    batch = db.batch()
+    for i in range(n):
+        total = float(rng.randrange(1_000, 500_000, 500))
+        paye = rng.choice([0.0, total / 2, total])
+        batch.set(db.collection("factures").document(), {
+            "type": rng.choice(TYPES),
+            "user_id": f"user-{i % 5}",
+            "client_name": f"Client {i}",
+            "montant": total,
+            "montant_total": total,
+            "montant_paye": paye,
+            "reliquat": total - paye,
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+        if (i + 1) % 500 == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+
+
+def expected(rows, user_id=None):
+    if user_id is not None:
+        rows = [r for r in rows if r.get("user_id") == user_id]
+        return {
+            "nb_factures": len(rows),
+            "total_paye": sum(float(r.get("montant_paye", 0)) for r in rows),
+            "total_facture": sum(float(r.get("montant_total", 0)) for r in rows),
+            "total_reliquat": sum(float(r.get("reliquat", 0)) for r in rows),
+        }
+    return {
+        "nb_factures": len(rows),
+        "total_global": sum(float(r.get("montant", 0)) for r in rows),
+        "total_factures": sum(float(r.get("montant", 0)) for r in rows if r.get("type") == TYPES[0]),
+        "total_recus": sum(float(r.get("montant", 0)) for r in rows if r.get("type") == TYPES[1]),
+        "nb_impayees": sum(1 for r in rows if float(r.get("reliquat", 0)) > 0),
+    }
+
+
+def compare(label, got, want):
+    ok = True
+    for key, value in want.items():
+        if abs(got[key] - value) > 0.01:
+            print(f"❌ {label} {key}: agrégation={got[key]} attendu={value}")
+            ok = False
+    if ok:
+        print(f"✅ {label} : {got}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="insère N factures de test (émulateur uniquement)")
+    args = parser.parse_args()
+
+    if args.seed:
+        if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            sys.exit("--seed n'est autorisé que contre l'émulateur (FIRESTORE_EMULATOR_HOST)")
+        seed(args.seed)
+
+    rows = [d.to_dict() for d in db.collection("factures").stream()]
+    ok = compare("admin", _admin_kpis(), expected(rows))
+    for user_id in sorted({r.get("user_id") for r in rows if r.get("user_id")})[:5]:
+        ok &= compare(f"user {user_id}", _user_kpis(user_id), expected(rows, user_id))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
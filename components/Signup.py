@@ -1,5 +1,6 @@
 import streamlit as st
-from firebase_utils import create_user
+from firebase_utils import create_user, normalize_email
+from components.session import start_session
 
 st.set_page_config(page_title="Inscription", layout="wide")
 
@@ -25,9 +26,7 @@ with st.form("signup_form"):
     if submit:
         try:
             uid = create_user(email, password, role)
-            st.session_state["authenticated"] = True
-            st.session_state["role"] = role
-            st.session_state["email"] = email
+            start_session({"email": normalize_email(email), "user_id": uid, "role": role})
             st.success(f"✅ Compte créé ({role}), UID: {uid}")
             st.switch_page("pages/Home.py")
         except Exception as e:
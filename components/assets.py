@@ -0,0 +1,121 @@
+import base64
+import logging
+import threading
+from io import BytesIO
+from pathlib import Path
+
+# -------------------------------
+# Registre des images des documents (logo, signatures)
+# -------------------------------
+# Chaque image est chargée une seule fois, réduite à sa taille d'affichage dans
+# le PDF puis gardée en mémoire (image encodée + data URI). Le fichier source est
+# surveillé : s'il change sur disque, l'entrée est reconstruite au prochain accès.
+
+# nom → (chemin, largeur d'affichage en px dans le HTML)
+ASSETS = {
+    "logo": ("assets/logo.png", 70),
+    "signature": ("assets/signature.png", 220),
+    "signature2": ("assets/signature2.png", 220),
+}
+
+# Profils de sortie PDF :
+# - print : qualité d'impression (PNG sans perte, 120 dpi)
+# - email : fichier compact pour l'envoi par mail (JPEG aplati sur fond blanc, 72 dpi).
+#   Les moteurs recopient le JPEG tel quel dans le PDF au lieu de stocker les pixels bruts.
+PROFILES = {
+    "print": {"dpi": 120, "format": "PNG"},
+    "email": {"dpi": 72, "format": "JPEG", "quality": 55},
+}
+DEFAULT_PROFILE = "print"
+
+
+def target_width(display_width, dpi):
+    # 1 px CSS = 0.75 pt
+    return int(round(display_width * 0.75 / 72 * dpi))
+
+
+class AssetEntry:
+    def __init__(self, version, image_bytes, size, mime):
+        self.version = version
+        self.image_bytes = image_bytes
+        self.size = size
+        self.mime = mime
+        self.data_uri = f"data:{mime};base64," + base64.b64encode(image_bytes).decode("ascii")
+
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def _file_version(path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load(path, display_width, profile):
+    from PIL import Image
+
+    settings = PROFILES[profile]
+    with Image.open(path) as img:
+        img.load()
+        width = target_width(display_width, settings["dpi"])
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        if settings["format"] == "JPEG":
+            # le JPEG n'a pas de transparence : on aplatit sur le fond blanc de la page
+            flat = Image.new("RGB", img.size, "white")
+            rgba = img.convert("RGBA")
+            flat.paste(rgba, mask=rgba.getchannel("A"))
+            flat.save(buffer, format="JPEG", quality=settings["quality"], optimize=True)
+            mime = "image/jpeg"
+        else:
+            img.save(buffer, format="PNG", optimize=True)
+            mime = "image/png"
+        return buffer.getvalue(), img.size, mime
+
+
+def get_asset(name, profile=DEFAULT_PROFILE):
+    """Retourne l'AssetEntry de l'image pour ce profil (rechargée si le fichier a changé), ou None."""
+    path_str, display_width = ASSETS[name]
+    path = Path(path_str)
+    try:
+        version = _file_version(path)
+    except OSError:
+        return None
+
+    key = (name, profile)
+    entry = _entries.get(key)
+    if entry is not None and entry.version == version:
+        return entry
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry.version != version:
+            try:
+                image_bytes, size, mime = _load(path, display_width, profile)
+            except Exception as e:
+                logging.warning(f"Image {path} illisible : {e}")
+                return None
+            entry = AssetEntry(version, image_bytes, size, mime)
+            _entries[key] = entry
+    return entry
+
+
+def asset_data_uri(name, profile=DEFAULT_PROFILE):
+    """data URI de l'image réduite, à utiliser directement dans un <img src=...>."""
+    entry = get_asset(name, profile)
+    return entry.data_uri if entry else ""
+
+
+def asset_bytes(name, profile=DEFAULT_PROFILE):
+    """Contenu encodé (PNG ou JPEG selon le profil) de l'image réduite, ou None si absente."""
+    entry = get_asset(name, profile)
+    return entry.image_bytes if entry else None
+
+
+def preload_assets():
+    for profile in PROFILES:
+        for name in ASSETS:
+            get_asset(name, profile)
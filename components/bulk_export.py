@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# -------------------------------
+# Export groupé des factures en ZIP
+# -------------------------------
+# Les PDF sont rendus dans un pool de processus (un par cœur disponible) et
+# écrits au fur et à mesure dans une archive sur disque (fichier temporaire dont
+# le chemin est retourné). Le nombre de rendus en vol est borné ;
+# st.download_button garde en mémoire le fichier qu'on lui passe : un export est
+# donc limité à EXPORT_MAX_FILES PDF.
+# Les processus du pool sont lancés en "spawn" : un fork du serveur Streamlit
+# (multithreadé, clients gRPC/Firestore actifs) peut bloquer sur un verrou hérité.
+EXPORT_MAX_FILES = int(os.environ.get("EXPORT_MAX_FILES", "2000"))
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pas disponible sous macOS / Windows
+        return os.cpu_count() or 1
+
+
+def process_pool(max_workers):
+    """Pool de processus lancés en "spawn" (jamais de fork du serveur)."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def facture_to_document(facture):
+    """Données attendues par les moteurs PDF à partir d'un document Firestore."""
+    return {
+        "client_name": facture.get("client_name", ""),
+        "client_phone": facture.get("client_phone", ""),
+        "client_email": facture.get("client_email", ""),
+        "items": facture.get("items", []),
+        "objet": facture.get("objet", ""),
+        "montant_total": facture.get("montant_total", facture.get("montant", 0.0)),
+        "montant_paye": facture.get("montant_paye", 0.0),
+        "avance": facture.get("avance", facture.get("montant_paye", 0.0)),
+        "reliquat": facture.get("reliquat", 0.0),
+    }
+
+
+def export_filename(facture):
+    prefix = "recu" if facture.get("type") == "Reçu de Paiement" else "facture"
+    client = re.sub(r"[^A-Za-z0-9_-]+", "_", str(facture.get("client_name", "")))[:40].strip("_")
+    parts = [facture.get("date", ""), prefix, client, facture.get("id", "")]
+    return "_".join(p for p in parts if p) + ".pdf"
+
+
+def _render_one(facture, engine):
+    # Exécuté dans un processus du pool : import local pour garder le pickling léger
+    from components.pdf_backends import render_document
+
+    type_doc = facture.get("type", "Facture de doit")
+    return export_filename(facture), render_document(facture_to_document(facture), type_doc, engine=engine)
+
+
+def export_factures_zip(factures, engine=None, max_workers=None, progress=None, max_files=EXPORT_MAX_FILES):
+    """
+    Rend chaque facture (itérable de dicts avec "id") en PDF et les ajoute à une archive ZIP.
+    Retourne (chemin du ZIP, nombre de PDF, liste des ids en échec, complet) ;
+    complet vaut False si l'export a été arrêté à max_files factures. Le fichier
+    temporaire est à supprimer par l'appelant. progress(done) est appelé après chaque PDF écrit.
+    """
+    max_workers = max_workers or available_cores()
+    max_in_flight = max_workers * 2
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".zip")
+    done_count = 0
+    failed = []
+    complete = True
+
+    try:
+        with os.fdopen(fd, "wb") as archive, \
+                zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf, \
+                process_pool(max_workers) as pool:
+            pending = {}
+
+            def drain(return_when):
+                nonlocal done_count
+                finished, _ = wait(pending, return_when=return_when)
+                for future in finished:
+                    facture_id = pending.pop(future)
+                    try:
+                        name, pdf_bytes = future.result()
+                    except Exception:
+                        pdf_bytes = None
+                    if not pdf_bytes:
+                        failed.append(facture_id)
+                        continue
+                    zf.writestr(name, pdf_bytes)
+                    done_count += 1
+                    if progress:
+                        progress(done_count)
+
+            for submitted, facture in enumerate(factures):
+                if submitted >= max_files:
+                    complete = False
+                    break
+                pending[pool.submit(_render_one, facture, engine)] = facture.get("id")
+                if len(pending) >= max_in_flight:
+                    drain(FIRST_COMPLETED)
+            while pending:
+                drain(FIRST_COMPLETED)
+    except BaseException:
+        os.remove(path)  # export interrompu : pas de fichier temporaire orphelin
+        raise
+
+    return path, done_count, failed, complete
@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from firebase_admin_setup import get_db
+
+# -------------------------------
+# Opérations de masse Firestore (BulkWriter)
+# -------------------------------
+# Les écritures partent en parallèle via un BulkWriter, avec la montée en charge
+# progressive 500/50/5 de Firestore plafonnée à BULK_MAX_OPS_PER_SECOND et des
+# relances automatiques en cas d'erreur transitoire. Les documents sont lus par
+# paquets de CHUNK_SIZE : chaque paquet est écrit (flush) avant de lire le suivant,
+# ce qui borne la mémoire et permet d'afficher l'avancement depuis le script.
+CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "500"))
+MAX_OPS_PER_SECOND = int(os.environ.get("BULK_MAX_OPS_PER_SECOND", "2000"))
+MAX_ATTEMPTS = 5
+
+# Sous-collections supprimées avec leur document parent
+SUBCOLLECTIONS = {"factures": ("paiements",)}
+
+
+class BulkResult:
+    """Bilan d'une opération de masse (compteurs mis à jour par les threads du BulkWriter)."""
+
+    def __init__(self):
+        self.done = 0
+        self.failed = []
+        self._lock = threading.Lock()
+
+    def _ok(self, *_):
+        with self._lock:
+            self.done += 1
+
+    def _error(self, failure, _writer):
+        if failure.attempts < MAX_ATTEMPTS:
+            return True  # relance avec backoff
+        path = getattr(getattr(failure.operation, "reference", None), "path", "?")
+        logging.error(f"Écriture {path} abandonnée : {failure.message}")
+        with self._lock:
+            self.failed.append(path)
+        return False
+
+    @property
+    def processed(self):
+        return self.done + len(self.failed)
+
+
+def _writer(result):
+    options = BulkWriterOptions(
+        initial_ops_per_second=min(500, MAX_OPS_PER_SECOND),
+        max_ops_per_second=MAX_OPS_PER_SECOND,
+    )
+    writer = get_db().bulk_writer(options=options)
+    writer.on_write_result(result._ok)
+    writer.on_write_error(result._error)
+    return writer
+
+
+def iter_chunks(query, chunk_size=CHUNK_SIZE):
+    """Parcourt une requête par paquets (curseur start_after) plutôt qu'avec un flux long."""
+    last = None
+    while True:
+        page = query.limit(chunk_size)
+        if last is not None:
+            page = page.start_after(last)
+        docs = list(page.stream())
+        if not docs:
+            return
+        yield docs
+        if len(docs) < chunk_size:
+            return
+        last = docs[-1]
+
+
+def _report(progress, result):
+    if progress is not None:
+        progress(result.processed)
+
+
+def _delete_query(writer, result, query, progress, keep=None):
+    # select([]) : seuls les identifiants sont transférés
+    for docs in iter_chunks(query.select([])):
+        for doc in docs:
+            if keep is None or keep(doc):
+                writer.delete(doc.reference)
+        writer.flush()
+        _report(progress, result)
+
+
+def delete_collection(collection, progress=None):
+    """
+    Supprime tous les documents d'une collection, sous-collections connues comprises
+    (SUBCOLLECTIONS). progress(n) reçoit le nombre de suppressions traitées.
+    """
+    result = BulkResult()
+    writer = _writer(result)
+    try:
+        for sub in SUBCOLLECTIONS.get(collection, ()):
+            # un seul parcours du groupe de collections plutôt qu'une requête par parent
+            _delete_query(writer, result, get_db().collection_group(sub), progress,
+                          keep=lambda doc: doc.reference.parent.parent.parent.id == collection)
+        _delete_query(writer, result, get_db().collection(collection), progress)
+    finally:
+        writer.close()
+    return result
+
+
+def delete_subcollections(ref):
+    """Supprime les sous-collections connues d'un document (le document lui-même est conservé)."""
+    result = BulkResult()
+    writer = _writer(result)
+    try:
+        for sub in SUBCOLLECTIONS.get(ref.parent.id, ()):
+            _delete_query(writer, result, ref.collection(sub), None)
+    finally:
+        writer.close()
+    return result
+
+
+def delete_documents(refs, progress=None):
+    """Supprime les documents donnés et leurs sous-collections connues."""
+    result = BulkResult()
+    writer = _writer(result)
+    try:
+        pending = 0
+        for ref in refs:
+            for sub in SUBCOLLECTIONS.get(ref.parent.id, ()):
+                _delete_query(writer, result, ref.collection(sub), None)
+            writer.delete(ref)
+            pending += 1
+            if pending >= CHUNK_SIZE:
+                writer.flush()
+                _report(progress, result)
+                pending = 0
+        writer.flush()
+        _report(progress, result)
+    finally:
+        writer.close()
+    return result
+
+
+def update_documents(updates, progress=None):
+    """
+    Applique des mises à jour partielles : updates est un itérable de (référence, champs).
+    Les références sont écrites par paquets de CHUNK_SIZE.
+    """
+    result = BulkResult()
+    writer = _writer(result)
+    try:
+        pending = 0
+        for ref, payload in updates:
+            writer.update(ref, payload)
+            pending += 1
+            if pending >= CHUNK_SIZE:
+                writer.flush()
+                _report(progress, result)
+                pending = 0
+        writer.flush()
+        _report(progress, result)
+    finally:
+        writer.close()
+    return result
+
+
+def merge_documents(writes, progress=None):
+    """
+    Écrit des champs en fusion (set merge=True, incréments compris) : writes est un
+    itérable de (référence, champs). Les documents absents sont créés.
+    """
+    result = BulkResult()
+    writer = _writer(result)
+    try:
+        pending = 0
+        for ref, payload in writes:
+            writer.set(ref, payload, merge=True)
+            pending += 1
+            if pending >= CHUNK_SIZE:
+                writer.flush()
+                _report(progress, result)
+                pending = 0
+        writer.flush()
+        _report(progress, result)
+    finally:
+        writer.close()
+    return result
+
+
+def update_query(query, build_payload, progress=None):
+    """
+    Met à jour chaque document d'une requête : build_payload(dict) → champs à écrire
+    (ou None pour ignorer le document).
+    """
+    def updates():
+        for docs in iter_chunks(query):
+            for doc in docs:
+                payload = build_payload(doc.to_dict())
+                if payload:
+                    yield doc.reference, payload
+
+    return update_documents(updates(), progress=progress)
@@ -0,0 +1,282 @@
+import logging
+import os
+
+from firebase_admin import firestore
+from firebase_admin_setup import get_db
+from components import bulk_ops, replica, summaries
+from components.ttl_cache import TTLCache
+
+# -------------------------------
+# Accès aux factures Firestore avec cache partagé
+# -------------------------------
+# Les lectures sont mises en cache par (rôle, user_id) pendant FACTURES_CACHE_TTL
+# secondes : un rerun Streamlit (clic, selectbox…) est servi depuis la mémoire.
+# Toute écriture faite par l'application passe par ce module et invalide les
+# entrées concernées (celles de l'utilisateur + les vues admin).
+# Les listes sont lues dans le réplica SQLite local (components/replica.py) ;
+# FACTURES_REPLICA=0 les fait lire directement dans Firestore.
+FACTURES_CACHE_TTL = int(os.environ.get("FACTURES_CACHE_TTL", "300"))
+REPLICA_ENABLED = os.environ.get("FACTURES_REPLICA", "1") != "0"
+COLLECTION = "factures"
+
+_cache = TTLCache(ttl=FACTURES_CACHE_TTL)
+
+
+def _cache_key(role, user_id, kind):
+    # l'admin voit toutes les factures : une seule entrée quel que soit son user_id
+    return ("admin", None, kind) if role == "admin" else ("user", user_id, kind)
+
+
+def cached(role, user_id, kind, loader):
+    """Résultat de loader() mis en cache pour (rôle, user_id, kind), invalidé avec les factures."""
+    return _cache.get_or_load(_cache_key(role, user_id, kind), loader)
+
+
+def _fetch(role, user_id):
+    query = get_db().collection(COLLECTION)
+    if role != "admin":
+        query = query.where("user_id", "==", user_id)
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+
+
+def load_factures(role, user_id):
+    """
+    Retourne la liste des factures visibles (dicts avec "id").
+    La liste est partagée via le cache : ne pas la modifier en place.
+    """
+    # réplica pas encore synchronisé (synchronisation complète en arrière-plan) → Firestore
+    if REPLICA_ENABLED and replica.ensure_fresh():
+        return replica.factures(role, user_id)
+    return cached(role, user_id, "list", lambda: _fetch(role, user_id))
+
+
+def invalidate_factures(user_id=None):
+    """Invalide le cache de l'utilisateur et des vues admin (tout le cache si user_id est inconnu)."""
+    replica.mark_stale()
+    if not isinstance(user_id, str) or not user_id:
+        _cache.invalidate()
+    else:
+        _cache.invalidate(lambda key: key[0] == "admin" or key[:2] == ("user", user_id))
+
+
+# -------------------------------
+# Requêtes filtrées côté Firestore
+# -------------------------------
+# Les filtres (type, statut, période, impayées) et la projection des champs sont
+# appliqués par Firestore : seuls les documents et champs utiles sont transférés.
+# Les index composites correspondants sont décrits dans firestore.indexes.json
+# (déploiement : firebase deploy --only firestore:indexes).
+
+# Champs nécessaires aux vues des impayés (tableau + enregistrement d'un paiement)
+UNPAID_FIELDS = ["date", "type", "client_name", "client_phone",
+                 "montant_total", "montant_paye", "reliquat", "status", "user_id"]
+
+
+def _as_date(value):
+    # les dates sont stockées en texte "YYYY-MM-DD"
+    return value if isinstance(value, str) else value.strftime("%Y-%m-%d")
+
+
+def query_factures(role, user_id, type_doc=None, status=None, date_from=None, date_to=None,
+                   unpaid=None, fields=None, order_by="date", descending=True):
+    """
+    Construit la requête Firestore des factures visibles.
+    unpaid : True → reliquat > 0, False → soldées (reliquat <= 0), None → toutes.
+    Firestore ignore les documents sans champ reliquat : rebuild_summaries.py --apply
+    le renseigne (0) sur les anciennes factures pour que unpaid=False les retrouve.
+    fields : liste des champs à projeter (select) ; None → document complet.
+    order_by : champ de tri (None → ordre par défaut de Firestore).
+    """
+    query = get_db().collection(COLLECTION)
+    if role != "admin":
+        query = query.where("user_id", "==", user_id)
+    if type_doc:
+        query = query.where("type", "==", type_doc)
+    if status:
+        query = query.where("status", "==", status)
+    if date_from:
+        query = query.where("date", ">=", _as_date(date_from))
+    if date_to:
+        query = query.where("date", "<=", _as_date(date_to))
+    if unpaid is True:
+        query = query.where("reliquat", ">", 0)
+    elif unpaid is False:
+        query = query.where("reliquat", "<=", 0)
+    if fields:
+        query = query.select(fields)
+    if order_by:
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = query.order_by(order_by, direction=direction)
+    return query
+
+
+def stream_factures(query):
+    """Flux paresseux de dicts (avec "id") pour une requête construite par query_factures."""
+    for doc in query.stream():
+        yield doc.to_dict() | {"id": doc.id}
+
+
+def iter_factures(query, chunk_size=bulk_ops.CHUNK_SIZE):
+    """
+    Comme stream_factures, mais par paquets de chunk_size (requêtes courtes successives) :
+    aucun flux ne reste ouvert pendant un traitement long (rendu PDF…), il ne peut donc
+    pas expirer en cours de route.
+    """
+    for docs in bulk_ops.iter_chunks(query, chunk_size):
+        for doc in docs:
+            yield doc.to_dict() | {"id": doc.id}
+
+
+def load_unpaid(role, user_id):
+    """Factures impayées (champs UNPAID_FIELDS), les plus gros reliquats d'abord ; mises en cache."""
+    if REPLICA_ENABLED and replica.ensure_fresh():
+        return replica.factures(role, user_id, unpaid=True, order="reliquat DESC, id")
+    query = query_factures(role, user_id, unpaid=True, fields=UNPAID_FIELDS, order_by="reliquat")
+    return cached(role, user_id, "unpaid", lambda: list(stream_factures(query)))
+
+
+# -------------------------------
+# Pagination par curseur (seule la page visible est lue)
+# -------------------------------
+DEFAULT_PAGE_SIZE = int(os.environ.get("FACTURES_PAGE_SIZE", "25"))
+
+
+def _firestore_cursor(start_after):
+    return start_after is not None and not isinstance(start_after, tuple)
+
+
+def page_factures(role, user_id, page_size=DEFAULT_PAGE_SIZE, start_after=None, **filters):
+    """
+    Lit une page de factures triées par date décroissante.
+    start_after : dernier DocumentSnapshot de la page précédente (None = première page).
+    filters : filtres de query_factures (type_doc, status, date_from, date_to, fields).
+    Retourne (lignes, curseur de fin de page, il_reste_des_pages).
+    """
+    if REPLICA_ENABLED and set(filters) <= {"type_doc"} and not _firestore_cursor(start_after):
+        # un curseur du réplica (tuple) reste dans le réplica, même pendant une resynchronisation
+        if replica.ensure_fresh() or start_after is not None:
+            return replica.page(role, user_id, page_size, start_after=start_after, **filters)
+    query = query_factures(role, user_id, **filters)
+    if start_after is not None:
+        query = query.start_after(start_after)
+    # une ligne de plus pour savoir s'il existe une page suivante, sans requête supplémentaire
+    docs = list(query.limit(page_size + 1).stream())
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+    rows = [doc.to_dict() | {"id": doc.id} for doc in docs]
+    return rows, (docs[-1] if docs else None), has_more
+
+
+# -------------------------------
+# Écritures (invalident le cache)
+# -------------------------------
+def stamped(payload):
+    """Ajoute updated_at (horodatage serveur) : clé de la synchronisation incrémentale du réplica."""
+    return payload | {"updated_at": firestore.SERVER_TIMESTAMP}
+
+
+def facture_ref(facture_id):
+    return get_db().collection(COLLECTION).document(facture_id)
+
+
+def get_facture(facture_id):
+    """Lecture directe d'une facture (dict avec "id"), ou None si introuvable."""
+    doc = facture_ref(facture_id).get()
+    if not doc.exists:
+        return None
+    return doc.to_dict() | {"id": doc.id}
+
+
+def create_facture(facture_doc):
+    """Crée une facture (et met à jour les synthèses dans le même batch) ; retourne son identifiant."""
+    ref = get_db().collection(COLLECTION).document()
+    batch = get_db().batch()
+    batch.set(ref, stamped(facture_doc))
+    summaries.apply_delta(batch, summaries.delta(None, facture_doc), facture_doc.get("user_id"))
+    batch.commit()
+    invalidate_factures(facture_doc.get("user_id"))
+    return ref.id
+
+
+@firestore.transactional
+def _update(transaction, ref, payload):
+    snap = ref.get(transaction=transaction)
+    old = snap.to_dict() if snap.exists else {}
+    transaction.update(ref, stamped(payload))
+    summaries.apply_delta(transaction, summaries.delta(old, old | payload), old.get("user_id"))
+
+
+def update_facture(facture_id, payload, user_id=None):
+    _update(get_db().transaction(), facture_ref(facture_id), payload)
+    invalidate_factures(user_id)
+
+
+@firestore.transactional
+def _delete(transaction, ref):
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return
+    old = snap.to_dict()
+    transaction.delete(ref)
+    summaries.apply_delta(transaction, summaries.delta(old, None), old.get("user_id"))
+
+
+def delete_facture(facture_id, user_id=None):
+    ref = facture_ref(facture_id)
+    _delete(get_db().transaction(), ref)
+    # puis la sous-collection paiements
+    bulk_ops.delete_subcollections(ref)
+    replica.remove([facture_id])
+    invalidate_factures(user_id)
+
+
+def delete_all_factures(progress=None):
+    """Supprime toutes les factures, leurs paiements et les synthèses ; retourne le BulkResult."""
+    result = bulk_ops.delete_collection(COLLECTION, progress=progress)
+    if not result.failed:
+        bulk_ops.delete_collection(summaries.STATS_COLLECTION)
+        # collection vide : la synthèse globale (à zéro) est complète
+        batch = get_db().batch()
+        summaries.mark_built(batch)
+        batch.commit()
+        replica.remove()
+    invalidate_factures()
+    logging.info(f"{result.done} documents supprimés ({len(result.failed)} échecs)")
+    return result
+
+
+def mark_factures_paid(facture_ids, progress=None):
+    """
+    Solde les factures données (montant_paye = montant_total, reliquat = 0).
+    Les factures sont lues en un seul appel (get_all), puis écrites par paquets avec
+    bulk_ops ; après chaque paquet, les synthèses reçoivent la différence des seules
+    factures effectivement mises à jour.
+    Retourne (BulkResult, identifiants introuvables).
+    """
+    refs = [facture_ref(fid) for fid in facture_ids]
+    found = [snap for snap in get_db().get_all(refs, field_paths=summaries.FIELDS) if snap.exists]
+    found_ids = {snap.id for snap in found}
+    result = bulk_ops.BulkResult()
+    for start in range(0, len(found), bulk_ops.CHUNK_SIZE):
+        chunk = []
+        for snap in found[start:start + bulk_ops.CHUNK_SIZE]:
+            old = snap.to_dict()
+            chunk.append((snap.reference, old, {
+                "montant_paye": float(old.get("montant_total", 0) or 0),
+                "reliquat": 0,
+                "status": "payée",
+            }))
+        written = bulk_ops.update_documents((ref, stamped(payload)) for ref, _, payload in chunk)
+        failed = set(written.failed)
+        deltas = {}
+        for ref, old, payload in chunk:
+            if ref.path not in failed:
+                summaries.add_deltas(deltas.setdefault(old.get("user_id"), {}), summaries.delta(old, old | payload))
+        if bulk_ops.merge_documents(summaries.summary_writes(deltas)).failed:
+            logging.error("Solde en masse : synthèses non mises à jour (lancer rebuild_summaries.py)")
+        result.done += written.done
+        result.failed.extend(written.failed)
+        if progress is not None:
+            progress(result.processed)
+    invalidate_factures()
+    return result, [fid for fid in facture_ids if fid not in found_ids]
@@ -0,0 +1,108 @@
+from firebase_admin_setup import get_db
+from components.factures_repo import COLLECTION, cached
+from components.summaries import read_summary
+
+# -------------------------------
+# Indicateurs calculés côté serveur (requêtes d'agrégation Firestore)
+# -------------------------------
+# count() / sum() sont évalués par Firestore : le coût d'une page ne dépend plus
+# du nombre de factures (une lecture facturée par tranche de 1 000 documents
+# agrégés, aucun document transféré). Résultats mis en cache avec les listes.
+# Les documents de synthèse (components/summaries.py) sont lus en priorité : une
+# seule lecture ; les agrégations ne servent que s'ils n'existent pas encore ou
+# n'ont pas été construits par rebuild_summaries.py (read_summary renvoie alors None).
+
+
+def _aggregate(query, sums=None, count_alias="nb"):
+    """Exécute count() + sum(champ) sur la requête en un seul aller-retour."""
+    agg = query.count(alias=count_alias)
+    for alias, field in (sums or {}).items():
+        agg = agg.sum(field, alias=alias)
+    values = {}
+    for result in agg.get():
+        for r in result:
+            values[r.alias] = r.value or 0
+    return values
+
+
+def _admin_kpis():
+    factures = get_db().collection(COLLECTION)
+    global_ = _aggregate(factures, {"total_global": "montant"})
+    facture_type = _aggregate(factures.where("type", "==", "Facture de doit"), {"total": "montant"})
+    recu_type = _aggregate(factures.where("type", "==", "Reçu de Paiement"), {"total": "montant"})
+    impayes = _aggregate(factures.where("reliquat", ">", 0))
+    return {
+        "nb_factures": int(global_.get("nb", 0)),
+        "total_global": float(global_.get("total_global", 0)),
+        "total_factures": float(facture_type.get("total", 0)),
+        "total_recus": float(recu_type.get("total", 0)),
+        "nb_impayees": int(impayes.get("nb", 0)),
+    }
+
+
+# statuts écrits par l'application (paiements, solde en masse) ; les autres sont regroupés
+STATUTS = ["payée", "partielle"]
+
+
+def _user_kpis(user_id):
+    query = get_db().collection(COLLECTION).where("user_id", "==", user_id)
+    values = _aggregate(query, {
+        "total_paye": "montant_paye",
+        "total_facture": "montant_total",
+        "total_reliquat": "reliquat",
+    })
+    nb_factures = int(values.get("nb", 0))
+    # répartition par statut : un count() par statut connu, le reste en "autre"
+    par_statut = {s: int(_aggregate(query.where("status", "==", s)).get("nb", 0)) for s in STATUTS}
+    par_statut["autre"] = nb_factures - sum(par_statut.values())
+    return {
+        "nb_factures": nb_factures,
+        "total_paye": float(values.get("total_paye", 0)),
+        "total_facture": float(values.get("total_facture", 0)),
+        "total_reliquat": float(values.get("total_reliquat", 0)),
+        "par_statut": {k: v for k, v in par_statut.items() if v},
+    }
+
+
+def _admin_from_summary(summary):
+    par_type = summary.get("montant_par_type", {})
+    return {
+        "nb_factures": int(summary.get("nb_factures", 0)),
+        "total_global": float(summary.get("total_montant", 0)),
+        "total_factures": float(par_type.get("Facture de doit", 0)),
+        "total_recus": float(par_type.get("Reçu de Paiement", 0)),
+        "nb_impayees": int(summary.get("nb_impayees", 0)),
+    }
+
+
+def _user_from_summary(summary):
+    return {
+        "nb_factures": int(summary.get("nb_factures", 0)),
+        "total_paye": float(summary.get("total_paye", 0)),
+        "total_facture": float(summary.get("total_facture", 0)),
+        "total_reliquat": float(summary.get("total_reliquat", 0)),
+        "par_statut": {k: int(v) for k, v in summary.get("nb_par_statut", {}).items() if v},
+    }
+
+
+def _load_admin_kpis():
+    summary = read_summary()
+    return _admin_from_summary(summary) if summary else _admin_kpis()
+
+
+def _load_user_kpis(user_id):
+    summary = read_summary(user_id)
+    return _user_from_summary(summary) if summary else _user_kpis(user_id)
+
+
+def admin_kpis():
+    """Aperçu global admin : montants par type, total, nombre d'impayées."""
+    return cached("admin", None, "kpis", _load_admin_kpis)
+
+
+def user_kpis(user_id):
+    """
+    Aperçu d'un utilisateur : nombre de factures, totaux payé / facturé / reliquat
+    et répartition par statut ("par_statut").
+    """
+    return cached("user", user_id, "kpis", lambda: _load_user_kpis(user_id))
@@ -0,0 +1,38 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# -------------------------------
+# Lectures Firestore en parallèle
+# -------------------------------
+# Les lectures indépendantes d'une page partent ensemble sur un pool de threads
+# partagé par tout le processus (le client Firestore, et son canal gRPC, est
+# lui-même partagé et thread-safe). La page attend donc la plus lente des
+# requêtes, pas leur somme. Chaque requête a un délai maximal (FETCH_TIMEOUT).
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "10"))
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+def fetch_all(tasks, timeout=FETCH_TIMEOUT):
+    """
+    Exécute en parallèle les fonctions sans argument de tasks (nom → fonction).
+    Retourne (résultats, erreurs) : deux dicts indexés par nom ; une requête en
+    erreur ou qui dépasse `timeout` secondes figure dans erreurs et pas dans résultats.
+    """
+    futures = {name: _executor.submit(fn) for name, fn in tasks.items()}
+    deadline = time.monotonic() + timeout
+    results, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            errors[name] = TimeoutError(f"{name} : pas de réponse après {timeout:.0f} s")
+            logging.warning(f"Lecture {name} abandonnée après {timeout:.0f} s")
+        except Exception as e:
+            errors[name] = e
+            logging.error(f"Lecture {name} en échec : {e}")
+    return results, errors
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+
+from components.factures_repo import query_factures, invalidate_factures
+
+# -------------------------------
+# Synchronisation temps réel des factures (listeners on_snapshot)
+# -------------------------------
+# Un listener Firestore par (rôle, user_id), partagé par toutes les sessions du
+# processus, maintient une table locale à partir des deltas (ajouts / modifications
+# / suppressions). Les pages lisent cette table : un rerun ne coûte aucune requête
+# et les écritures des autres caissiers arrivent d'elles-mêmes.
+# Un listener inutilisé pendant IDLE_TIMEOUT secondes est détaché.
+IDLE_TIMEOUT = 1800
+READY_TIMEOUT = 15
+
+
+class LiveTable:
+    def __init__(self, role, user_id):
+        self.role = role
+        self.user_id = user_id
+        self.version = 0
+        self.last_access = time.monotonic()
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        query = query_factures(role, user_id, order_by=None)
+        self._watch = query.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, _snapshots, changes, _read_time):
+        # appelé par le thread du listener : le premier appel contient tout le résultat
+        with self._lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    self._rows.pop(change.document.id, None)
+                else:
+                    self._rows[change.document.id] = change.document.to_dict() | {"id": change.document.id}
+            self.version += 1
+        if self._ready.is_set() and changes:
+            # écriture faite ailleurs : les vues mises en cache (KPIs, impayés…) sont à recalculer
+            invalidate_factures(self.user_id if self.role != "admin" else None)
+        self._ready.set()
+
+    @property
+    def active(self):
+        return self._watch.is_active
+
+    def snapshot(self):
+        """Retourne (lignes, version) ; attend le premier résultat du listener."""
+        self.last_access = time.monotonic()
+        if not self._ready.wait(READY_TIMEOUT):
+            raise TimeoutError("Le listener Firestore n'a pas répondu")
+        with self._lock:
+            return list(self._rows.values()), self.version
+
+    def close(self):
+        self._watch.unsubscribe()
+
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def _prune():
+    now = time.monotonic()
+    for key, table in list(_tables.items()):
+        if now - table.last_access > IDLE_TIMEOUT or not table.active:
+            del _tables[key]
+            try:
+                table.close()
+            except Exception as e:
+                logging.warning(f"Fermeture du listener {key} : {e}")
+
+
+def live_table(role, user_id):
+    """Table temps réel des factures visibles pour (rôle, user_id), créée au premier appel."""
+    key = ("admin", None) if role == "admin" else ("user", user_id)
+    with _lock:
+        _prune()
+        table = _tables.get(key)
+        if table is None:
+            table = _tables[key] = LiveTable(*key)
+    return table
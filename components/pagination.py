@@ -0,0 +1,57 @@
+import streamlit as st
+
+# -------------------------------
+# Tableau paginé (curseurs Firestore) pour Streamlit
+# -------------------------------
+# L'état (curseurs, lignes visibles) vit dans st.session_state : un rerun ne relit
+# rien, seule une navigation (suivant / précédent / charger plus) interroge Firestore.
+
+PAGE_SIZES = [25, 50, 100]
+
+
+def paginated_table(key, fetch_page, signature=None, columns=None):
+    """
+    Affiche un tableau paginé.
+    fetch_page(page_size, start_after) → (lignes, curseur, il_reste_des_pages)
+    signature : valeur décrivant les filtres ; si elle change, on revient à la première page.
+    """
+    state_key = f"_pager_{key}"
+    page_size = st.selectbox("Lignes par page", PAGE_SIZES, key=f"{key}_page_size")
+    state = st.session_state.get(state_key)
+
+    if state is None or state["signature"] != (signature, page_size):
+        # cursors[i] = curseur de départ de la page i (None pour la première)
+        state = {"signature": (signature, page_size), "cursors": [None], "page": 0,
+                 "rows": None, "next": None, "more": False}
+        st.session_state[state_key] = state
+
+    def load(page, append=False):
+        rows, cursor, more = fetch_page(page_size, state["cursors"][page])
+        state["rows"] = (state["rows"] or []) + rows if append else rows
+        state["next"], state["more"], state["page"] = cursor, more, page
+
+    if state["rows"] is None:
+        load(0)
+
+    def go_next(append=False):
+        state["cursors"] = state["cursors"][:state["page"] + 1] + [state["next"]]
+        load(state["page"] + 1, append=append)
+
+    # callbacks : exécutés avant le rendu, les boutons reflètent donc la page chargée
+    col_prev, col_next, col_more, col_refresh = st.columns(4)
+    col_prev.button("◀ Précédent", key=f"{key}_prev", disabled=state["page"] == 0,
+                    on_click=lambda: load(state["page"] - 1))
+    col_next.button("Suivant ▶", key=f"{key}_next", disabled=not state["more"], on_click=go_next)
+    # "charger plus" ajoute la page suivante aux lignes déjà affichées
+    col_more.button("⬇️ Charger plus", key=f"{key}_more", disabled=not state["more"],
+                    on_click=lambda: go_next(append=True))
+    col_refresh.button("🔄 Actualiser", key=f"{key}_refresh", on_click=lambda: load(state["page"]))
+
+    rows = state["rows"]
+    if not rows:
+        st.info("Aucune facture à afficher")
+        return
+    if columns:
+        rows = [{c: r.get(c) for c in columns} for r in rows]
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"Page {state['page'] + 1} — {len(state['rows'])} ligne(s) affichée(s)")
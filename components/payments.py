@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from firebase_admin import firestore
+from firebase_admin_setup import get_db
+from components import summaries
+from components.factures_repo import facture_ref, invalidate_factures, stamped
+
+# -------------------------------
+# Enregistrement des paiements
+# -------------------------------
+# Un paiement = une écriture dans la sous-collection "paiements" + la mise à jour
+# de montant_paye / reliquat / status de la facture. Les deux sont faits dans la
+# même transaction, à partir de la facture relue dans la transaction (et non d'une
+# ligne de tableau potentiellement périmée) : deux caissiers qui encaissent la même
+# facture ne peuvent plus écraser le paiement de l'autre. Les montants sont appliqués
+# avec des incréments côté serveur, de même que les documents de synthèse.
+
+
+class PaymentError(Exception):
+    pass
+
+
+@firestore.transactional
+def _record(transaction, ref, montant, paiement):
+    snap = ref.get(field_paths=summaries.FIELDS, transaction=transaction)
+    if not snap.exists:
+        raise PaymentError("Facture introuvable")
+    facture = snap.to_dict()
+    reliquat = float(facture.get("reliquat", 0) or 0)
+    if reliquat <= 0:
+        raise PaymentError("Cette facture est déjà soldée")
+    # None = solder le reliquat restant
+    montant = reliquat if montant is None else float(montant)
+    if montant <= 0:
+        raise PaymentError("Le montant doit être positif")
+    if montant > reliquat:
+        raise PaymentError(f"Le montant dépasse le reliquat ({reliquat:,.0f} FCFA)")
+
+    nouveau_reliquat = reliquat - montant
+    status = "payée" if nouveau_reliquat <= 0 else "partielle"
+    paiement_ref = ref.collection("paiements").document()
+    transaction.create(paiement_ref, paiement | {"montant": montant})
+    transaction.update(ref, stamped({
+        "montant_paye": firestore.Increment(montant),
+        "reliquat": firestore.Increment(-montant),
+        "status": status,
+    }))
+    # synthèses mises à jour dans la même transaction
+    after = facture | {
+        "montant_paye": float(facture.get("montant_paye", 0) or 0) + montant,
+        "reliquat": nouveau_reliquat,
+        "status": status,
+    }
+    summaries.apply_delta(transaction, summaries.delta(facture, after), facture.get("user_id"))
+    return {
+        "paiement_id": paiement_ref.id,
+        "montant": montant,
+        "reliquat": max(nouveau_reliquat, 0),
+        "user_id": facture.get("user_id"),
+    }
+
+
+def record_payment(facture_id, montant=None, user_id=None, mode="manuel"):
+    """
+    Enregistre un paiement sur une facture (montant=None : solde le reliquat).
+    Retourne un dict (paiement_id, montant, reliquat, user_id) ; lève PaymentError si refusé.
+    """
+    paiement = {
+        "date": datetime.utcnow().isoformat(),
+        "user_id": user_id,
+        "mode": mode,
+    }
+    result = _record(get_db().transaction(), facture_ref(facture_id), montant, paiement)
+    invalidate_factures(result["user_id"])
+    return result
+
+
+def list_paiements(facture_id):
+    """Paiements d'une facture, du plus récent au plus ancien."""
+    query = facture_ref(facture_id).collection("paiements").order_by("date", direction=firestore.Query.DESCENDING)
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+
+
+def recent_paiements(limit=20):
+    """Derniers paiements toutes factures confondues (requête sur le groupe de collections)."""
+    query = (
+        get_db().collection_group("paiements")
+        .order_by("date", direction=firestore.Query.DESCENDING)
+        .limit(limit)
+    )
+    return [doc.to_dict() | {"id": doc.id, "facture_id": doc.reference.parent.parent.id} for doc in query.stream()]
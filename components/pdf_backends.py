@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfgen import canvas
+
+from components.assets import DEFAULT_PROFILE, asset_bytes, get_asset
+from components.pdf_cache import pdf_cache, cache_key
+from components.pdf_generator import LONG_DOCUMENT_THRESHOLD, build_facture_html, format_number, generate_pdf
+
+# -------------------------------
+# Moteurs PDF interchangeables
+# -------------------------------
+# Le moteur par défaut se choisit avec la variable d'environnement PDF_ENGINE
+# ("html" = xhtml2pdf, "reportlab" = dessin direct). En cas d'échec du moteur
+# choisi, on retombe toujours sur le moteur HTML.
+DEFAULT_ENGINE = os.environ.get("PDF_ENGINE", "html")
+# Les très longues factures (au-delà de LONG_DOCUMENT_THRESHOLD lignes) passent par le
+# moteur natif quand aucun moteur n'est imposé : son coût reste linéaire et sa mémoire
+# bornée à une page, là où xhtml2pdf met plusieurs secondes pour 1 000 lignes.
+LONG_DOCUMENT_ENGINE = os.environ.get("PDF_LONG_DOCUMENT_ENGINE", "reportlab")
+
+# noms des images du registre components.assets
+LOGO = "logo"
+SIGNATURE = "signature"
+SIGNATURE2 = "signature2"
+
+COMPANY_LINES = [
+    "HAMDALLAYE ACI 2000",
+    "IMMEUBLE MOUSSA ARAMA",
+    "RUE 384, PORTE 249",
+    "Tél : +223 74 56 43 95",
+    "Email : sidibeyakouba@ymail.com",
+]
+FOOTER_LINES = [
+    "MABOU-INSTRUMED-SARL | RCCM : Ma.Bko.2023.M11004 | NIF : 084148985H | HAMDALLAYE ACI 2000",
+    "Tél : +223 74 56 43 95 | IMMEUBLE MOUSSA ARAMA | Email : sidibeyakouba@ymail.com",
+]
+
+
+class PdfBackend(ABC):
+    """Interface commune : transforme les données d'un document en PDF (bytes)."""
+
+    name = ""
+
+    @abstractmethod
+    def render(self, data, type_doc, use_cache=True, profile=DEFAULT_PROFILE):
+        """Retourne le PDF (bytes), ou None en cas d'erreur."""
+
+
+class HtmlBackend(PdfBackend):
+    """Moteur historique : HTML Jinja2 → xhtml2pdf."""
+
+    name = "html"
+
+    def render(self, data, type_doc, use_cache=True, profile=DEFAULT_PROFILE):
+        html = build_facture_html(data, type_doc=type_doc, profile=profile)
+        if html is None:
+            return None
+        return generate_pdf(html, use_cache=use_cache)
+
+
+class ReportlabBackend(PdfBackend):
+    """Dessin direct des mises en page facture / reçu avec reportlab (sans HTML ni CSS)."""
+
+    name = "reportlab"
+
+    WIDTH, HEIGHT = A4
+    MARGIN = 40
+    TITLE_COLOR = (0 / 255, 51 / 255, 102 / 255)
+    # largeurs des colonnes du tableau : Description, Date, Qté, Prix unitaire, Montant
+    COLUMNS = [205, 70, 40, 100, 100]
+    ROW_PADDING = 4
+    FONT_SIZE = 9
+
+    def render(self, data, type_doc, use_cache=True, profile=DEFAULT_PROFILE):
+        if type_doc not in ("Facture de doit", "Reçu de Paiement"):
+            return None
+        today = datetime.today().strftime("%d/%m/%Y")
+        key = cache_key(self.name, profile, type_doc, today, json.dumps(data, sort_keys=True, default=str))
+        if use_cache:
+            pdf_bytes = pdf_cache.get(key)
+            if pdf_bytes is not None:
+                return pdf_bytes
+
+        pdf_bytes = self._draw(data, type_doc, today, profile)
+        if use_cache:
+            pdf_cache.put(key, pdf_bytes)
+        return pdf_bytes
+
+    # ---------------- Dessin ----------------
+    def _draw(self, data, type_doc, today, profile):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+        y = self._draw_header(c, data, profile)
+
+        if type_doc == "Facture de doit":
+            y = self._draw_title(c, "FACTURE", y)
+            y = self._draw_facture_body(c, data, y)
+            signature = SIGNATURE2
+        else:
+            y = self._draw_title(c, "REÇU DE PAIEMENT", y)
+            c.setFont("Helvetica-Bold", 10)
+            c.drawString(self.MARGIN, y, "Objet :")
+            c.setFont("Helvetica", 10)
+            c.drawString(self.MARGIN + 40, y, str(data.get("objet", "")))
+            y -= 16
+            y = self._draw_amount(c, "Montant payé :", data.get("montant_paye", 0.0), y)
+            signature = SIGNATURE
+
+        self._draw_signature(c, signature, today, y, profile)
+        self._draw_footer(c)
+        c.save()
+        return buffer.getvalue()
+
+    def _draw_image(self, c, name, x, y_top, width, profile):
+        reader = _image_reader(name, profile)
+        if reader is None:
+            return 0
+        img_w, img_h = reader.getSize()
+        height = width * img_h / img_w
+        c.drawImage(reader, x, y_top - height, width=width, height=height, mask="auto")
+        return height
+
+    def _draw_header(self, c, data, profile):
+        top = self.HEIGHT - self.MARGIN
+        y = top - self._draw_image(c, LOGO, self.MARGIN, top, 52, profile) - 12
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(self.MARGIN, y, "MABOU-INSTRUMED-SARL")
+        c.setFont("Helvetica", 9)
+        for line in COMPANY_LINES:
+            y -= 12
+            c.drawString(self.MARGIN, y, line)
+
+        right = self.WIDTH - self.MARGIN
+        c.setFont("Helvetica-Bold", 10)
+        c.drawRightString(right, top - 10, f"Client : {data.get('client_name', '')}")
+        c.setFont("Helvetica", 9)
+        c.drawRightString(right, top - 24, f"Tél : {data.get('client_phone', '')}")
+        c.drawRightString(right, top - 38, f"Email : {data.get('client_email', '')}")
+
+        y -= 10
+        c.line(self.MARGIN, y, right, y)
+        return y - 22
+
+    def _draw_title(self, c, title, y):
+        c.setFillColorRGB(*self.TITLE_COLOR)
+        c.setFont("Helvetica-Bold", 13)
+        c.drawCentredString(self.WIDTH / 2, y, title)
+        c.setFillColorRGB(0, 0, 0)
+        return y - 24
+
+    def _draw_amount(self, c, label, value, y):
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(self.MARGIN, y, label)
+        c.setFont("Helvetica", 10)
+        c.drawString(self.MARGIN + c.stringWidth(label, "Helvetica-Bold", 10) + 4, y,
+                     f"{format_number(value)} FCFA")
+        return y - 16
+
+    def _draw_table_header(self, c, y):
+        x = self.MARGIN
+        row_h = self.FONT_SIZE + 2 * self.ROW_PADDING
+        c.setFillColorRGB(0.95, 0.95, 0.95)
+        c.rect(x, y - row_h, sum(self.COLUMNS), row_h, stroke=0, fill=1)
+        c.setFillColorRGB(0, 0, 0)
+        c.setFont("Helvetica-Bold", self.FONT_SIZE)
+        for label, w in zip(["Description", "Date", "Qté", "Prix unitaire", "Montant"], self.COLUMNS):
+            c.rect(x, y - row_h, w, row_h, stroke=1, fill=0)
+            c.drawCentredString(x + w / 2, y - row_h + self.ROW_PADDING + 1, label)
+            x += w
+        return y - row_h
+
+    def _split_description(self, description):
+        return simpleSplit(description, "Helvetica", self.FONT_SIZE, self.COLUMNS[0] - 2 * self.ROW_PADDING) or [""]
+
+    def _row_height(self, desc_lines):
+        return len(desc_lines) * (self.FONT_SIZE + 2) + 2 * self.ROW_PADDING
+
+    def _draw_row(self, c, cells, desc_lines, y):
+        row_h = self._row_height(desc_lines)
+        x = self.MARGIN
+        c.setFont("Helvetica", self.FONT_SIZE)
+        baseline = y - self.ROW_PADDING - self.FONT_SIZE
+        for i, w in enumerate(self.COLUMNS):
+            c.rect(x, y - row_h, w, row_h, stroke=1, fill=0)
+            if i == 0:
+                for j, line in enumerate(desc_lines):
+                    c.drawString(x + self.ROW_PADDING, baseline - j * (self.FONT_SIZE + 2), line)
+            elif i in (1, 2):
+                c.drawCentredString(x + w / 2, baseline, cells[i])
+            else:
+                c.drawRightString(x + w - self.ROW_PADDING, baseline, cells[i])
+            x += w
+        return y - row_h
+
+    def _draw_summary_row(self, c, label, value, y, bold=False):
+        row_h = self.FONT_SIZE + 2 * self.ROW_PADDING
+        label_w = sum(self.COLUMNS[:-1])
+        x = self.MARGIN
+        c.rect(x, y - row_h, label_w, row_h, stroke=1, fill=0)
+        c.rect(x + label_w, y - row_h, self.COLUMNS[-1], row_h, stroke=1, fill=0)
+        c.setFont("Helvetica-Bold" if bold else "Helvetica-Oblique", self.FONT_SIZE)
+        baseline = y - row_h + self.ROW_PADDING + 1
+        c.drawRightString(x + label_w - self.ROW_PADDING, baseline, label)
+        c.drawRightString(x + label_w + self.COLUMNS[-1] - self.ROW_PADDING, baseline, f"{format_number(value)} FCFA")
+        return y - row_h
+
+    def _draw_facture_body(self, c, data, y):
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(self.MARGIN, y, "Objet :")
+        c.setFont("Helvetica", 10)
+        c.drawString(self.MARGIN + 40, y, str(data.get("objet", "")))
+        y -= 10
+
+        bottom = self.MARGIN + 40  # place réservée au pied de page
+        summary_h = 2 * (self.FONT_SIZE + 2 * self.ROW_PADDING)  # sous-total + à reporter
+        y = self._draw_table_header(c, y)
+        total_ht = 0
+        page_subtotal = 0
+        page_number = 1
+        for item in data.get("items", []):
+            montant = item["qty"] * item["price"]
+            description = str(item.get("description", ""))
+            desc_lines = self._split_description(description)
+            if y - self._row_height(desc_lines) - summary_h < bottom:
+                # fin de page : sous-total, report du cumul, puis en-tête répété
+                y = self._draw_summary_row(c, f"Sous-total page {page_number}", page_subtotal, y, bold=True)
+                self._draw_summary_row(c, "À reporter", total_ht, y)
+                self._draw_footer(c)
+                c.showPage()
+                page_number += 1
+                page_subtotal = 0
+                y = self._draw_table_header(c, self.HEIGHT - self.MARGIN)
+                y = self._draw_summary_row(c, "Report", total_ht, y)
+            total_ht += montant
+            page_subtotal += montant
+            cells = [description, str(item.get("date", "")), str(item["qty"]),
+                     f"{format_number(item['price'])} FCFA", f"{format_number(montant)} FCFA"]
+            y = self._draw_row(c, cells, desc_lines, y)
+        if page_number > 1:
+            y = self._draw_summary_row(c, f"Sous-total page {page_number}", page_subtotal, y, bold=True)
+
+        montant_total = data.get("montant_total", total_ht)
+        montant_paye = data.get("montant_paye", 0.0)
+        reliquat = data.get("reliquat", montant_total - montant_paye)
+        if y - 60 < bottom:
+            self._draw_footer(c)
+            c.showPage()
+            y = self.HEIGHT - self.MARGIN
+        y -= 18
+        y = self._draw_amount(c, "Montant total :", montant_total, y)
+        y = self._draw_amount(c, "Montant payé :", montant_paye, y)
+        y = self._draw_amount(c, "Reliquat :", reliquat, y)
+        return y
+
+    def _draw_signature(self, c, signature, today, y, profile):
+        reader = _image_reader(signature, profile)
+        sig_w = 165
+        sig_h = 0
+        if reader is not None:
+            img_w, img_h = reader.getSize()
+            sig_h = sig_w * img_h / img_w
+        bottom = self.MARGIN + 40
+        if y - 10 - sig_h < bottom:
+            self._draw_footer(c)
+            c.showPage()
+            y = self.HEIGHT - self.MARGIN
+        right = self.WIDTH - self.MARGIN
+        c.line(self.MARGIN, y, right, y)
+        y -= 10
+        self._draw_image(c, signature, right - sig_w, y, sig_w, profile)
+        c.setFont("Helvetica", 10)
+        c.drawRightString(right - sig_w - 10, y - sig_h / 2, f"Fait à Bamako, le {today}")
+
+    def _draw_footer(self, c):
+        c.setFont("Helvetica", 8)
+        c.setFillColorRGB(0.33, 0.33, 0.33)
+        for i, line in enumerate(FOOTER_LINES):
+            c.drawCentredString(self.WIDTH / 2, self.MARGIN - i * 10, line)
+        c.setFillColorRGB(0, 0, 0)
+
+
+@lru_cache(maxsize=16)
+def _load_image(name, profile, version):
+    return ImageReader(BytesIO(asset_bytes(name, profile)))
+
+
+def _image_reader(name, profile=DEFAULT_PROFILE):
+    entry = get_asset(name, profile)
+    if entry is None:
+        return None
+    return _load_image(name, profile, entry.version)
+
+
+BACKENDS = {
+    HtmlBackend.name: HtmlBackend(),
+    ReportlabBackend.name: ReportlabBackend(),
+}
+
+
+def get_backend(name=None):
+    """Retourne le moteur demandé (ou PDF_ENGINE), HTML si le nom est inconnu."""
+    return BACKENDS.get(name or DEFAULT_ENGINE, BACKENDS["html"])
+
+
+def render_document(data, type_doc, engine=None, use_cache=True, profile=DEFAULT_PROFILE):
+    """
+    Génère le PDF (bytes) d'un document avec le moteur choisi.
+    profile : "print" (qualité d'impression) ou "email" (fichier compact).
+    Le moteur HTML sert de repli si le moteur natif échoue.
+    """
+    if engine is None and len(data.get("items") or []) > LONG_DOCUMENT_THRESHOLD:
+        engine = LONG_DOCUMENT_ENGINE
+    backend = get_backend(engine)
+    if backend.name != "html":
+        try:
+            pdf_bytes = backend.render(data, type_doc, use_cache=use_cache, profile=profile)
+            if pdf_bytes:
+                return pdf_bytes
+        except Exception as e:
+            logging.warning(f"Moteur PDF {backend.name} en échec, repli sur HTML : {e}")
+    return BACKENDS["html"].render(data, type_doc, use_cache=use_cache, profile=profile)
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# -------------------------------
+# Cache de rendu PDF (mémoire LRU + disque plafonné)
+# -------------------------------
+ASSETS_DIR = Path("assets")
+CACHE_DIR = Path(os.environ.get("PDF_CACHE_DIR", "data/pdf_cache"))
+MEMORY_MAX_ENTRIES = int(os.environ.get("PDF_CACHE_MEMORY_ENTRIES", "64"))
+MEMORY_MAX_BYTES = int(os.environ.get("PDF_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+DISK_MAX_BYTES = int(os.environ.get("PDF_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+
+
+def assets_version() -> str:
+    """
+    Empreinte des fichiers du dossier assets (nom, taille, date de modification).
+    Change dès qu'un logo ou une signature est remplacé → les PDF en cache sont ignorés.
+    """
+    h = hashlib.sha256()
+    if ASSETS_DIR.exists():
+        for p in sorted(ASSETS_DIR.iterdir()):
+            if p.is_file():
+                stat = p.stat()
+                h.update(f"{p.name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()
+
+
+def cache_key(*parts: str) -> str:
+    """Clé de cache : hash du contenu (HTML…) et de la version des assets."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    h.update(assets_version().encode("utf-8"))
+    return h.hexdigest()
+
+
+class PdfCache:
+    """
+    Cache à deux niveaux pour les PDF générés.
+    - mémoire : LRU borné en nombre d'entrées et en octets
+    - disque : un fichier par clé dans CACHE_DIR, taille totale plafonnée
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_max_entries=MEMORY_MAX_ENTRIES,
+                 memory_max_bytes=MEMORY_MAX_BYTES, disk_max_bytes=DISK_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    # ---------------- Mémoire ----------------
+    def _memory_put(self, key, data):
+        if len(data) > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory and (len(self._memory) > self.memory_max_entries
+                                or self._memory_bytes > self.memory_max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # ---------------- Disque ----------------
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.pdf"
+
+    def _disk_get(self, key):
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # marque l'entrée comme récemment utilisée
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._disk_path(key)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self._disk_evict()
+        except OSError as e:
+            logging.warning(f"Cache PDF disque indisponible : {e}")
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob("*.pdf"):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+            total += stat.st_size
+        if total <= self.disk_max_bytes:
+            return
+        # supprimer les plus anciens jusqu'à repasser sous le plafond
+        for _, size, p in sorted(entries):
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+            if total <= self.disk_max_bytes:
+                break
+
+    # ---------------- API ----------------
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        data = self._disk_get(key)
+        if data is not None:
+            with self._lock:
+                self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for p in self.cache_dir.glob("*.pdf"):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+pdf_cache = PdfCache()
@@ -1,17 +1,13 @@
-import tempfile
-from xhtml2pdf import pisa
+from components.pdf_generator import generate_pdf as _render_pdf
 
 
 def generate_pdf(html_content):
     """
     Génération PDF compatible Streamlit Cloud
+    Retourne le PDF en bytes (aucun fichier temporaire), ou None en cas d'erreur.
     """
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            status = pisa.CreatePDF(html_content, dest=tmp)
-            if status.err:
-                return None
-            return tmp.name
+        return _render_pdf(html_content)
     except Exception as e:
         print("PDF Error:", e)
         return None
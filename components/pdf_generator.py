@@ -1,151 +1,143 @@
-from xhtml2pdf import pisa
+from io import BytesIO
+from functools import lru_cache
+from pathlib import Path
+from reportlab import rl_config
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from datetime import datetime
+from components.pdf_cache import pdf_cache, cache_key
+from components.assets import DEFAULT_PROFILE, asset_data_uri, preload_assets
+
+# Flux PDF compressés (Flate) écrits en binaire, sans surcouche ASCII85 (+25 % de taille)
+rl_config.useA85 = 0
 
 def format_number(n):
     return f"{n:,.0f}".replace(",", ".")
 
-def generate_pdf(html_content, filename="document.pdf"):
-    with open(filename, "wb") as f:
-        pisa_status = pisa.CreatePDF(html_content, dest=f)
-    if pisa_status.err:
-        return None
-    return filename
-
-def build_facture_html(data, type_doc="Facture"):
-    logo_path = "assets/logo.png"
-    signature_path = "assets/signature.png"
-    signature2_path = "assets/signature2.png"
-    today = datetime.today().strftime("%d/%m/%Y")
-
-    css_style = """
-    <style>
-        body { font-family: Arial, sans-serif; font-size: 13px; line-height: 1.3; }
-        h3 { text-align: center; color: #003366; margin: 10px 0; }
-        table { width: 100%; border-collapse: collapse; font-size: 12px; margin-top: 10px; }
-        th { background-color: #f2f2f2; border: 1px solid #999; padding: 4px; text-align: center; }
-        td { border: 1px solid #999; padding: 4px; }
-        td.desc { max-width: 250px; word-wrap: break-word; }
-        .footer { font-size: 11px; text-align: center; color: #555; margin-top: 20px; }
-        .signature { display: flex; justify-content: flex-end; align-items: center; gap: 10px; margin-top: 20px; }
-    </style>
+def generate_pdf(html_content, use_cache=True):
     """
-
-    footer_text = """
-    <div class="footer">
-    MABOU-INSTRUMED-SARL | RCCM : Ma.Bko.2023.M11004 | NIF : 084148985H | HAMDALLAYE ACI 2000  
-    Tél : +223 74 56 43 95 | IMMEUBLE MOUSSA ARAMA | Email : sidibeyakouba@ymail.com
-    </div>
+    Génère le PDF en mémoire et retourne son contenu (bytes), ou None en cas d'erreur.
+    Aucun fichier n'est écrit : chaque session reçoit son propre buffer.
+    """
+    # Un HTML identique (et les mêmes assets) donne le même PDF → on réutilise le rendu
+    key = cache_key(html_content)
+    pdf_bytes = pdf_cache.get(key) if use_cache else None
+    if pdf_bytes is None:
+        # import différé : xhtml2pdf est long à charger et inutile au moteur reportlab
+        from xhtml2pdf import pisa
+
+        buffer = BytesIO()
+        pisa_status = pisa.CreatePDF(html_content, dest=buffer)
+        if pisa_status.err:
+            return None
+        pdf_bytes = buffer.getvalue()
+        if use_cache:
+            pdf_cache.put(key, pdf_bytes)
+    return pdf_bytes
+
+# -------------------------------
+# Modèles Jinja2 (compilés une seule fois par processus)
+# -------------------------------
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+# type de document → modèle ; un nouveau type = un nouveau fichier qui étend base.html
+DOCUMENT_TEMPLATES = {
+    "Facture de doit": "facture.html",
+    "Reçu de Paiement": "recu.html",
+}
+
+
+# Au-delà de LONG_DOCUMENT_THRESHOLD lignes, la facture est découpée en tableaux d'une
+# page (en-tête répété, sous-total par page, report du cumul) : xhtml2pdf gère mal
+# un seul très grand tableau, alors que plusieurs petits restent linéaires.
+LONG_DOCUMENT_THRESHOLD = 30
+# capacité d'une page en unités de hauteur : une ligne de tableau coûte son nombre de
+# lignes de texte (une description longue se replie) plus une unité de marges
+FIRST_PAGE_LINES = 44
+PAGE_LINES = 64
+DESC_CHARS_PER_LINE = 22
+
+
+def row_lines(item):
+    return max(1, -(-len(str(item.get("description", ""))) // DESC_CHARS_PER_LINE)) + 1
+
+
+def paginate_items(items, first_page_lines=FIRST_PAGE_LINES, page_lines=PAGE_LINES):
     """
+    Découpe les lignes en pages. Chaque page est un dict :
+    rows (lignes avec leur montant), report (cumul des pages précédentes),
+    subtotal (total de la page) et cumulative (cumul à la fin de la page).
+    """
+    pages = []
+    page_rows = []
+    subtotal = 0
+    cumulative = 0
+    used = 0
+    limit = first_page_lines
+    for item in items:
+        lines = row_lines(item)
+        if page_rows and used + lines > limit:
+            pages.append({"rows": page_rows, "report": cumulative, "subtotal": subtotal,
+                          "cumulative": cumulative + subtotal})
+            cumulative += subtotal
+            page_rows, subtotal, used, limit = [], 0, 0, page_lines
+        montant = item["qty"] * item["price"]
+        page_rows.append({**item, "montant": montant})
+        subtotal += montant
+        used += lines
+    if page_rows or not pages:
+        pages.append({"rows": page_rows, "report": cumulative, "subtotal": subtotal,
+                      "cumulative": cumulative + subtotal})
+    return pages
+
+
+# Les images sont décodées et réduites une fois au démarrage, puis servies depuis la mémoire
+preload_assets()
+
+
+@lru_cache(maxsize=1)
+def get_template_env():
+    env = Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=select_autoescape(["html"]),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.filters["format_number"] = format_number
+    return env
+
+
+def build_facture_html(data, type_doc="Facture", profile=DEFAULT_PROFILE):
+    template_name = DOCUMENT_TEMPLATES.get(type_doc)
+    if template_name is None:
+        return None
+
+    context = {
+        "data": data,
+        "logo_path": asset_data_uri("logo", profile),
+        "signature_path": asset_data_uri("signature", profile),
+        "signature2_path": asset_data_uri("signature2", profile),
+        "today": datetime.today().strftime("%d/%m/%Y"),
+        "objet": data.get("objet", ""),
+        "montant_paye": data.get("montant_paye", 0.0),
+    }
 
     # ---------------- FACTURE ----------------
     if type_doc == "Facture de doit":
-        items_html = ""
-        total_ht = 0
-        for item in data["items"]:
-            montant = item["qty"] * item["price"]
-            total_ht += montant
-            items_html += f"""
-            <tr>
-                <td class="desc">{item['description']}</td>
-                <td style="text-align:center;">{item['date']}</td>
-                <td style="text-align:center;">{item['qty']}</td>
-                <td style="text-align:right;">{format_number(item['price'])} FCFA</td>
-                <td style="text-align:right;">{format_number(montant)} FCFA</td>
-            </tr>
-            """
+        items = data["items"]
+        long_document = len(items) > LONG_DOCUMENT_THRESHOLD
+        if long_document:
+            pages = paginate_items(items)
+        else:
+            pages = paginate_items(items, first_page_lines=float("inf"))
+        total_ht = pages[-1]["cumulative"]
 
         montant_total = data.get("montant_total", total_ht)
-        montant_paye = data.get("montant_paye", 0.0)
-        reliquat = data.get("reliquat", montant_total - montant_paye)
-        objet = data.get("objet", "")
-
-        html = f"""
-        {css_style}
-        <div style="width:650px; padding:10px;">
-            <div style="display:flex; justify-content:space-between;">
-                <div>
-                    <img src="{logo_path}" width="70"><br>
-                    <b>MABOU-INSTRUMED-SARL</b><br>
-                    HAMDALLAYE ACI 2000<br>
-                    IMMEUBLE MOUSSA ARAMA<br>
-                    RUE 384, PORTE 249<br>
-                    Tél : +223 74 56 43 95<br>
-                    Email : sidibeyakouba@ymail.com
-                </div>
-                <div style="text-align:right;">
-                    <b>Client :</b> {data['client_name']}<br>
-                    Tél : {data.get('client_phone','')}<br>
-                    Email : {data.get('client_email','')}
-                </div>
-            </div>
-
-            <hr>
-            <h3>FACTURE</h3>
-
-            <p><b>Objet :</b> {objet}</p>
-
-            <table>
-                <thead>
-                    <tr>
-                        <th>Description</th><th>Date</th><th>Qté</th><th>Prix unitaire</th><th>Montant</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {items_html}
-                </tbody>
-            </table>
-
-            <p><b>Montant total :</b> {format_number(montant_total)} FCFA</p>
-            <p><b>Montant payé :</b> {format_number(montant_paye)} FCFA</p>
-            <p><b>Reliquat :</b> {format_number(reliquat)} FCFA</p>
-
-            <hr>
-            <div class="signature">
-                <p style="margin:0;">Fait à Bamako, le {today}</p>
-                <img src="{signature2_path}" width="220">
-            </div>
-
-            {footer_text}
-        </div>
-        """
-        return html
-
-    # ---------------- REÇU ----------------
-    elif type_doc == "Reçu de Paiement":
-        montant_paye = data.get("montant_paye", 0.0)
-        html = f"""
-        {css_style}
-        <div style="width:650px; padding:10px;">
-            <div style="display:flex; justify-content:space-between;">
-                <div>
-                    <img src="{logo_path}" width="70"><br>
-                    <b>MABOU-INSTRUMED-SARL</b><br>
-                    HAMDALLAYE ACI 2000<br>
-                    IMMEUBLE MOUSSA ARAMA<br>
-                    RUE 384, PORTE 249<br>
-                    Tél : +223 74 56 43 95<br>
-                    Email : sidibeyakouba@ymail.com
-                </div>
-                <div style="text-align:right;">
-                    <b>Client :</b> {data['client_name']}<br>
-                    Tél : {data.get('client_phone','')}<br>
-                    Email : {data.get('client_email','')}
-                </div>
-            </div>
-
-            <hr>
-            <h3>REÇU DE PAIEMENT</h3>
-
-            <p><b>Objet :</b> {data.get('objet','')}</p>
-            <p><b>Montant payé :</b> {format_number(montant_paye)} FCFA</p>
-
-            <hr>
-            <div class="signature">
-                <p style="margin:0;">Fait à Bamako, le {today}</p>
-                <img src="{signature_path}" width="220">
-            </div>
-
-            {footer_text}
-        </div>
-        """
-        return html
+        context.update({
+            "pages": pages,
+            "long_document": long_document,
+            "montant_total": montant_total,
+            "reliquat": data.get("reliquat", montant_total - context["montant_paye"]),
+        })
+
+    return get_template_env().get_template(template_name).render(context)
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from components.bulk_export import available_cores, process_pool
+
+# -------------------------------
+# File de génération PDF en arrière-plan
+# -------------------------------
+# Le script Streamlit ne fait que soumettre un rendu et récupérer un identifiant :
+# le PDF est produit par un pool de processus partagé par toutes les sessions,
+# puis gardé en mémoire (JOB_TTL secondes, MAX_JOBS au plus) pour le téléchargement.
+# L'enregistrement du document (on_done) est fait côté serveur dès que le PDF est
+# prêt, sur un petit pool de threads : il a lieu même si la session qui a lancé le
+# rendu a fermé l'onglet ou expiré. Le job n'est DONE qu'une fois cet enregistrement fait.
+JOB_TTL = 3600
+MAX_JOBS = 200
+SAVE_WORKERS = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _render(data, type_doc, engine, profile):
+    # Exécuté dans un processus du pool
+    from components.pdf_backends import render_document
+
+    return render_document(data, type_doc, engine=engine, profile=profile)
+
+
+class PdfJob:
+    def __init__(self, job_id, filename, owner=None, on_done=None):
+        self.id = job_id
+        self.filename = filename
+        self.owner = owner
+        self.on_done = on_done
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.result = None
+        self.error = None
+        self.saved = None       # valeur retournée par on_done
+        self.save_error = None
+
+    @property
+    def status(self):
+        if self.future is None:
+            return PENDING
+        # finished_at n'est posé qu'après le rappel de fin (et l'enregistrement) :
+        # un future terminé dont le rappel n'a pas encore tourné est toujours « en cours »
+        if self.finished_at is None:
+            return RUNNING if self.future.running() or self.future.done() else PENDING
+        return FAILED if self.error else DONE
+
+
+class PdfJobQueue:
+    def __init__(self, max_workers=None, job_ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.max_workers = max_workers or available_cores()
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._saver = ThreadPoolExecutor(max_workers=SAVE_WORKERS, thread_name_prefix="pdf-save")
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = process_pool(self.max_workers)
+        return self._pool
+
+    def submit(self, data, type_doc, filename="document.pdf", engine=None, owner=None, profile="print",
+               on_done=None):
+        """
+        Met un rendu en file et retourne l'identifiant du job.
+        on_done() est appelé côté serveur une fois le PDF généré (jamais en cas d'échec) ;
+        sa valeur de retour est gardée dans job.saved, son erreur dans job.save_error.
+        """
+        job = PdfJob(uuid.uuid4().hex, filename, owner=owner, on_done=on_done)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            try:
+                job.future = self._get_pool().submit(_render, data, type_doc, engine, profile)
+            except BrokenProcessPool:
+                # un processus du pool est mort : on repart sur un pool neuf
+                self._pool = None
+                job.future = self._get_pool().submit(_render, data, type_doc, engine, profile)
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job.id
+
+    def _finish(self, job, future):
+        try:
+            job.result = future.result()
+            if not job.result:
+                job.error = "PDF vide"
+        except Exception as e:
+            job.error = str(e)
+            logging.error(f"Génération PDF {job.id} en échec : {e}")
+        if job.error or job.on_done is None:
+            job.finished_at = time.time()
+        else:
+            # hors du thread de rappel du pool de processus, qui sert aussi les autres jobs
+            self._saver.submit(self._save, job)
+
+    def _save(self, job):
+        try:
+            job.saved = job.on_done()
+        except Exception as e:
+            job.save_error = str(e)
+            logging.error(f"Enregistrement du document du job PDF {job.id} en échec : {e}")
+        job.finished_at = time.time()
+
+    def get(self, job_id, owner=None):
+        """Retourne le job (ou None s'il a expiré / appartient à une autre session)."""
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner not in (None, owner)):
+            return None
+        return job
+
+    def discard(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and now - job.finished_at > self.job_ttl:
+                del self._jobs[job_id]
+        # au-delà de MAX_JOBS, on oublie les plus anciens jobs terminés
+        finished = sorted((j for j in self._jobs.values() if j.finished_at), key=lambda j: j.finished_at)
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
+
+
+job_queue = PdfJobQueue()
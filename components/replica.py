@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from firebase_admin_setup import get_db
+
+# -------------------------------
+# Réplica SQLite local de la collection "factures"
+# -------------------------------
+# Les listes et analyses lisent data/factures.db (mode WAL : lectures concurrentes
+# pendant la synchronisation). La synchronisation est incrémentale : seules les
+# factures dont updated_at (SERVER_TIMESTAMP posé à chaque écriture) est postérieur
+# au dernier passage sont relues. Une synchronisation complète est faite au premier
+# lancement puis toutes les FULL_SYNC_INTERVAL secondes pour rattraper les
+# suppressions faites hors de l'application et les documents sans updated_at ; elle
+# tourne en arrière-plan (ou via init_db.py --sync), les pages lisent Firestore en attendant.
+# Le fichier contient les données clients : il est hors du dépôt (.gitignore).
+# En cas de coupure réseau, les lectures continuent sur les données locales.
+REPLICA_PATH = os.environ.get("FACTURES_REPLICA_PATH", "data/factures.db")
+SYNC_INTERVAL = int(os.environ.get("REPLICA_SYNC_INTERVAL", "30"))
+FULL_SYNC_INTERVAL = int(os.environ.get("REPLICA_FULL_SYNC_INTERVAL", "86400"))
+COLLECTION = "factures"
+CLOCK_MARGIN = 60
+
+# Colonnes indexables / filtrables ; le document complet est gardé en JSON dans "data"
+TEXT_COLUMNS = ["user_id", "type", "date", "client_name", "client_phone", "status"]
+REAL_COLUMNS = ["montant", "montant_total", "montant_paye", "reliquat"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS factures (
+    id TEXT PRIMARY KEY,
+    {", ".join(f"{c} TEXT" for c in TEXT_COLUMNS)},
+    {", ".join(f"{c} REAL" for c in REAL_COLUMNS)},
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_factures_user_date ON factures (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_factures_date ON factures (date);
+CREATE INDEX IF NOT EXISTS idx_factures_type ON factures (type, date);
+CREATE INDEX IF NOT EXISTS idx_factures_reliquat ON factures (reliquat);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_sync_lock = threading.Lock()
+_schema_ready = False
+_last_attempt = 0.0
+_stale = True
+_failed = False
+_synced = False  # au moins une synchronisation complète a abouti (données locales utilisables)
+_full_thread = None
+
+
+def connect(path=None):
+    path = path or REPLICA_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def init_schema(conn):
+    """Crée (ou met à niveau) le schéma du réplica."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(factures)")}
+    if columns and "data" not in columns:
+        # ancienne table locale jamais alimentée (id INTEGER, client, montant…) : on la remplace
+        conn.execute("DROP TABLE factures")
+    conn.executescript(SCHEMA)
+    conn.commit()
+
+
+def _conn():
+    global _schema_ready
+    conn = connect()
+    if not _schema_ready:
+        init_schema(conn)
+        _schema_ready = True
+    return conn
+
+
+def _get_state(conn, key):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def _set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def _to_row(doc_id, facture):
+    row = {"id": doc_id}
+    for c in TEXT_COLUMNS:
+        value = facture.get(c)
+        row[c] = None if value is None else str(value)
+    # date jamais NULL : elle sert de clé de pagination
+    row["date"] = row["date"] or ""
+    for c in REAL_COLUMNS:
+        try:
+            row[c] = float(facture.get(c) or 0)
+        except (TypeError, ValueError):
+            row[c] = 0.0
+    updated_at = facture.get("updated_at")
+    row["updated_at"] = updated_at.isoformat() if isinstance(updated_at, datetime) else None
+    row["data"] = json.dumps(facture, ensure_ascii=False, default=str)
+    return row
+
+
+_COLUMNS = ["id", *TEXT_COLUMNS, *REAL_COLUMNS, "updated_at", "data"]
+_UPSERT = (
+    f"INSERT OR REPLACE INTO factures ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+)
+
+
+def _upsert(conn, docs):
+    """Écrit les documents Firestore ; retourne (nombre, plus grand updated_at vu)."""
+    count, newest = 0, None
+    for doc in docs:
+        row = _to_row(doc.id, doc.to_dict())
+        conn.execute(_UPSERT, [row[c] for c in _COLUMNS])
+        count += 1
+        if row["updated_at"] and (newest is None or row["updated_at"] > newest):
+            newest = row["updated_at"]
+    return count, newest
+
+
+def full_sync(conn):
+    started = datetime.now(timezone.utc)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM seen")
+    count = 0
+    for doc in get_db().collection(COLLECTION).stream():
+        _upsert(conn, [doc])
+        conn.execute("INSERT OR IGNORE INTO seen (id) VALUES (?)", (doc.id,))
+        count += 1
+    removed = conn.execute("DELETE FROM factures WHERE id NOT IN (SELECT id FROM seen)").rowcount
+    # la prochaine synchronisation incrémentale repart du début de celle-ci
+    # (avec une marge pour un éventuel décalage entre l'horloge locale et celle du serveur)
+    _set_state(conn, "last_updated_at", (started - timedelta(seconds=CLOCK_MARGIN)).isoformat())
+    _set_state(conn, "last_full_sync", started.isoformat())
+    conn.commit()
+    logging.info(f"Réplica : synchronisation complète ({count} factures, {removed} supprimées)")
+
+
+def incremental_sync(conn, since):
+    query = (
+        get_db().collection(COLLECTION)
+        .where("updated_at", ">=", datetime.fromisoformat(since))
+        .order_by("updated_at")
+    )
+    count, newest = _upsert(conn, query.stream())
+    if newest:
+        _set_state(conn, "last_updated_at", newest)
+    conn.commit()
+    if count:
+        logging.info(f"Réplica : {count} facture(s) mise(s) à jour")
+
+
+def _needs_full(conn):
+    since = _get_state(conn, "last_updated_at")
+    last_full = _get_state(conn, "last_full_sync")
+    return since is None or last_full is None or (
+        datetime.now(timezone.utc) - datetime.fromisoformat(last_full)
+    ).total_seconds() > FULL_SYNC_INTERVAL
+
+
+def _sync(full=False):
+    global _last_attempt, _stale, _synced
+    _last_attempt = time.monotonic()
+    # remis à zéro avant la lecture : une écriture pendant la synchronisation la marque à nouveau
+    _stale = False
+    conn = _conn()
+    try:
+        if full or _needs_full(conn):
+            full_sync(conn)
+        else:
+            incremental_sync(conn, _get_state(conn, "last_updated_at"))
+        _synced = True
+    except Exception:
+        _stale = True
+        raise
+    finally:
+        conn.close()
+
+
+def sync(full=False):
+    """Synchronise le réplica (complet si demandé, si jamais fait ou trop ancien)."""
+    with _sync_lock:
+        _sync(full)
+
+
+def _full_sync_in_background():
+    """Lance la synchronisation complète dans un thread (une seule à la fois)."""
+    global _full_thread
+
+    def run():
+        global _failed
+        try:
+            sync(full=True)
+            _failed = False
+        except Exception as e:
+            _failed = True
+            logging.warning(f"Réplica : synchronisation complète impossible ({e})")
+
+    if _full_thread is None or not _full_thread.is_alive():
+        _full_thread = threading.Thread(target=run, name="replica-full-sync", daemon=True)
+        _full_thread.start()
+
+
+def _fresh(max_age):
+    # après un échec, on attend max_age avant de réessayer même si le réplica est périmé
+    return time.monotonic() - _last_attempt < max_age and (not _stale or _failed)
+
+
+def ensure_fresh(max_age=SYNC_INTERVAL):
+    """
+    Synchronise si le réplica est marqué périmé ou si le dernier passage date de plus
+    de max_age secondes. Retourne True si le réplica peut être lu, False s'il faut lire
+    Firestore : la synchronisation complète (premier lancement, rattrapage périodique)
+    parcourt toute la collection et tourne en arrière-plan, jamais dans la requête d'une
+    page (init_db.py --sync la fait d'avance). Une erreur réseau est journalisée : on lit
+    alors les données locales.
+    """
+    global _failed, _synced
+    if _full_thread is not None and _full_thread.is_alive():
+        # pendant la synchronisation complète : données locales si elles sont à jour
+        return _synced and not _stale
+    if _fresh(max_age):
+        return _synced
+    # si un autre thread synchronise déjà, on attend la fin de son passage
+    with _sync_lock:
+        if _fresh(max_age):
+            return _synced
+        conn = _conn()
+        try:
+            needs_full = _needs_full(conn)
+            _synced = _synced or _get_state(conn, "last_updated_at") is not None
+        finally:
+            conn.close()
+        if needs_full:
+            _full_sync_in_background()
+            return _synced and not _stale
+        try:
+            _sync()
+            _failed = False
+        except Exception as e:
+            _failed = True
+            logging.warning(f"Réplica : synchronisation impossible, lecture des données locales ({e})")
+        return True
+
+
+def mark_stale():
+    """À appeler après une écriture : la prochaine lecture relance une synchronisation incrémentale."""
+    global _stale
+    _stale = True
+
+
+def remove(facture_ids=None):
+    """Retire des factures du réplica (toutes si facture_ids est None)."""
+    conn = _conn()
+    try:
+        if facture_ids is None:
+            conn.execute("DELETE FROM factures")
+        else:
+            conn.executemany("DELETE FROM factures WHERE id = ?", ((fid,) for fid in facture_ids))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# -------------------------------
+# Lectures
+# -------------------------------
+def _where(role, user_id, type_doc=None, unpaid=None):
+    clauses, params = [], []
+    if role != "admin":
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if type_doc:
+        clauses.append("type = ?")
+        params.append(type_doc)
+    if unpaid is True:
+        clauses.append("reliquat > 0")
+    elif unpaid is False:
+        clauses.append("COALESCE(reliquat, 0) <= 0")  # sans reliquat = soldée
+    return clauses, params
+
+
+def _decode(row):
+    return json.loads(row["data"]) | {"id": row["id"]}
+
+
+def factures(role, user_id, type_doc=None, unpaid=None, order="date DESC, id DESC"):
+    """Factures visibles (dicts avec "id"), lues localement."""
+    clauses, params = _where(role, user_id, type_doc, unpaid)
+    sql = "SELECT id, data FROM factures"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    conn = _conn()
+    try:
+        return [_decode(row) for row in conn.execute(f"{sql} ORDER BY {order}", params)]
+    finally:
+        conn.close()
+
+
+def page(role, user_id, page_size, start_after=None, type_doc=None):
+    """
+    Page de factures par date décroissante, paginée par clé (date, id).
+    start_after : curseur retourné pour la page précédente. Même contrat que page_factures.
+    """
+    clauses, params = _where(role, user_id, type_doc)
+    if start_after is not None:
+        clauses.append("(date, id) < (?, ?)")
+        params.extend(start_after)
+    sql = "SELECT id, date, data FROM factures"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date DESC, id DESC LIMIT ?"
+    conn = _conn()
+    try:
+        rows = conn.execute(sql, [*params, page_size + 1]).fetchall()
+    finally:
+        conn.close()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    cursor = (rows[-1]["date"], rows[-1]["id"]) if rows else None
+    return [_decode(row) for row in rows], cursor, has_more
+
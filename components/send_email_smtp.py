@@ -1,9 +1,15 @@
 import smtplib
+import streamlit as st
+from pathlib import Path
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 
-def send_email_smtp(sender, password, recipient, subject, body, pdf_file):
+def send_email_smtp(sender, password, recipient, subject, body, pdf_file, filename="document.pdf"):
+    """
+    Envoie un email avec le PDF en pièce jointe.
+    pdf_file : contenu du PDF (bytes / BytesIO, ex. retour de generate_pdf) ou chemin d'un fichier.
+    """
     try:
         # Création du message
         msg = MIMEMultipart()
@@ -15,10 +21,16 @@ def send_email_smtp(sender, password, recipient, subject, body, pdf_file):
         msg.attach(MIMEText(body, 'plain'))
 
         # Pièce jointe PDF
-        with open(pdf_file, "rb") as f:
-            attach = MIMEApplication(f.read(), _subtype="pdf")
-            attach.add_header('Content-Disposition', 'attachment', filename=pdf_file)
-            msg.attach(attach)
+        if isinstance(pdf_file, (bytes, bytearray)):
+            pdf_bytes = bytes(pdf_file)
+        elif hasattr(pdf_file, "getvalue"):  # BytesIO
+            pdf_bytes = pdf_file.getvalue()
+        else:
+            pdf_bytes = Path(pdf_file).read_bytes()
+            filename = Path(pdf_file).name
+        attach = MIMEApplication(pdf_bytes, _subtype="pdf")
+        attach.add_header('Content-Disposition', 'attachment', filename=filename)
+        msg.attach(attach)
 
         # Connexion SMTP (exemple Gmail)
         server = smtplib.SMTP("smtp.gmail.com", 587)
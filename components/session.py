@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+
+import streamlit as st
+
+# -------------------------------
+# Session signée
+# -------------------------------
+# À la connexion, l'identité (email, user_id, rôle) est placée dans un jeton signé
+# (HMAC-SHA256) gardé en session. Les pages vérifient la signature et l'expiration
+# localement : un rerun ou un changement de page ne relit Firestore qu'à l'expiration
+# du cache des rôles (ROLE_CACHE_TTL), et une valeur modifiée dans st.session_state
+# (rôle…) n'est pas prise en compte.
+# Le rôle fait foi dans le cache des rôles (firebase_utils, invalidé par set_user_role) :
+# s'il diffère de celui du jeton, le jeton est re-signé. Contrôle d'accès et périmètre
+# des données utilisent donc toujours la même valeur.
+# SESSION_SECRET (variable d'environnement ou clé de .streamlit/secrets.toml, voir
+# secrets.toml.example) doit être fixé : sans lui, chaque processus tire une clé au
+# hasard et un redémarrage ou un second worker déconnecte tout le monde.
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(12 * 3600)))
+
+
+def _load_secret():
+    secret = os.environ.get("SESSION_SECRET")
+    if not secret:
+        try:
+            secret = st.secrets.get("SESSION_SECRET")
+        except Exception:  # pas de fichier secrets.toml
+            secret = None
+    if secret:
+        return str(secret).encode()
+    logging.warning(
+        "SESSION_SECRET absent : clé de session aléatoire propre à ce processus "
+        "(sessions perdues au redémarrage et non partagées entre workers)"
+    )
+    return secrets.token_bytes(32)
+
+
+_SECRET = _load_secret()
+
+TOKEN_KEY = "session_token"
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(body):
+    return _b64(hmac.new(_SECRET, body.encode("ascii"), hashlib.sha256).digest())
+
+
+def sign_session(email, user_id, role, ttl=SESSION_TTL):
+    claims = {"email": email, "user_id": user_id, "role": role, "exp": int(time.time()) + ttl}
+    body = _b64(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_signature(body)}"
+
+
+def verify_session(token):
+    """Retourne les informations du jeton s'il est valide et non expiré, sinon None."""
+    try:
+        body, signature = token.split(".", 1)
+        if not hmac.compare_digest(signature, _signature(body)):
+            return None
+        claims = json.loads(_unb64(body))
+    except (AttributeError, ValueError):
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+def start_session(user):
+    """Ouvre la session à partir du dict {email, user_id, role} renvoyé par verify_user."""
+    st.session_state[TOKEN_KEY] = sign_session(user["email"], user["user_id"], user["role"])
+    st.session_state["authenticated"] = True
+    st.session_state["role"] = user["role"]
+    st.session_state["email"] = user["email"]
+    st.session_state["user_id"] = user["user_id"]
+
+
+def current_user():
+    """
+    Utilisateur connecté ({email, user_id, role}) d'après le jeton signé, ou None.
+    Le rôle est celui du cache des rôles ; les valeurs de st.session_state sont
+    réalignées sur le jeton.
+    """
+    claims = verify_session(st.session_state.get(TOKEN_KEY))
+    if claims is None:
+        st.session_state["authenticated"] = False
+        return None
+    # import différé : la page de connexion (sans session) n'initialise pas Firebase
+    from firebase_utils import get_user_role
+
+    role = get_user_role(claims["email"])
+    if role and role != claims["role"]:
+        # promotion / rétrogradation depuis l'ouverture de session : même expiration
+        ttl = max(0, claims["exp"] - int(time.time()))
+        st.session_state[TOKEN_KEY] = sign_session(claims["email"], claims["user_id"], role, ttl=ttl)
+        claims = claims | {"role": role}
+    st.session_state["authenticated"] = True
+    st.session_state["role"] = claims["role"]
+    st.session_state["email"] = claims["email"]
+    st.session_state["user_id"] = claims["user_id"]
+    return claims
+
+
+def end_session():
+    for key in (TOKEN_KEY, "role", "email", "user_id"):
+        st.session_state.pop(key, None)
+    st.session_state["authenticated"] = False
@@ -0,0 +1,146 @@
+from firebase_admin import firestore
+from firebase_admin_setup import get_db
+
+# -------------------------------
+# Documents de synthèse (collection "stats")
+# -------------------------------
+# stats/global et stats/user_<user_id> contiennent les compteurs et totaux des
+# factures. Chaque écriture de facture faite par l'application y applique, dans la
+# même transaction / le même batch, la différence entre l'ancienne et la nouvelle
+# version de la facture (incréments serveur). Les tableaux de bord lisent ainsi un
+# seul document. rebuild_summaries.py recalcule tout en cas de dérive.
+# Une synthèse n'est fiable que si elle a été construite par rebuild_summaries.py
+# (champ "version") : sur une base existante, la première écriture crée le document
+# avec le seul incrément de cette écriture. Sans marqueur, les tableaux de bord
+# gardent les agrégations Firestore.
+STATS_COLLECTION = "stats"
+GLOBAL_ID = "global"
+SUMMARY_VERSION = 1
+
+# Champs de facture nécessaires au calcul d'une contribution
+FIELDS = ["user_id", "type", "status", "montant", "montant_total", "montant_paye", "reliquat"]
+
+
+def _num(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def summary_ref(user_id=None):
+    doc_id = GLOBAL_ID if user_id is None else f"user_{user_id}"
+    return get_db().collection(STATS_COLLECTION).document(doc_id)
+
+
+def contribution(facture):
+    """Part d'une facture dans une synthèse (clés simples ou (map, clé) pour les répartitions)."""
+    if not facture:
+        return {}
+    reliquat = _num(facture.get("reliquat"))
+    return {
+        "nb_factures": 1,
+        "total_montant": _num(facture.get("montant")),
+        "total_facture": _num(facture.get("montant_total")),
+        "total_paye": _num(facture.get("montant_paye")),
+        "total_reliquat": reliquat,
+        "nb_impayees": 1 if reliquat > 0 else 0,
+        ("montant_par_type", facture.get("type") or "inconnu"): _num(facture.get("montant")),
+        ("nb_par_statut", facture.get("status") or "inconnu"): 1,
+    }
+
+
+def delta(old, new):
+    """Différence de contribution entre deux versions d'une facture (None = absente)."""
+    result = dict(contribution(new))
+    for key, value in contribution(old).items():
+        result[key] = result.get(key, 0) - value
+    return {k: v for k, v in result.items() if v}
+
+
+def increments(values):
+    payload = {}
+    for key, value in values.items():
+        if isinstance(key, tuple):
+            payload.setdefault(key[0], {})[key[1]] = firestore.Increment(value)
+        else:
+            payload[key] = firestore.Increment(value)
+    return payload
+
+
+def apply_delta(writer, values, user_id):
+    """
+    Ajoute à writer (WriteBatch ou Transaction) la mise à jour des synthèses
+    globale et utilisateur. Les documents sont créés au besoin (merge).
+    """
+    if not values:
+        return
+    payload = increments(values)
+    writer.set(summary_ref(), payload, merge=True)
+    if user_id:
+        writer.set(summary_ref(user_id), payload, merge=True)
+
+
+def summary_writes(deltas):
+    """
+    deltas : {user_id: valeurs} → [(référence, incréments)] pour les synthèses
+    utilisateur concernées et la synthèse globale (somme de toutes les valeurs).
+    """
+    writes, global_delta = [], {}
+    for user_id, values in deltas.items():
+        add_deltas(global_delta, values)
+        if user_id and values:
+            writes.append((summary_ref(user_id), increments(values)))
+    if global_delta:
+        writes.append((summary_ref(), increments(global_delta)))
+    return writes
+
+
+def add_deltas(total, values):
+    """Cumule values dans total (pour regrouper plusieurs factures dans un même batch)."""
+    for key, value in values.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def is_complete(summary):
+    """Vrai si la synthèse a été construite par rebuild_summaries.py (et non créée par un incrément)."""
+    return bool(summary) and summary.get("version") == SUMMARY_VERSION
+
+
+def read_summary(user_id=None):
+    """
+    Synthèse globale (user_id=None) ou d'un utilisateur ; None si elle n'existe pas
+    ou n'a pas encore été construite (voir is_complete).
+    """
+    snap = summary_ref(user_id).get()
+    summary = snap.to_dict() if snap.exists else None
+    return summary if is_complete(summary) else None
+
+
+def mark_built(writer, user_id=None):
+    """Marque une synthèse comme complète (collection vide : tous les totaux valent 0)."""
+    writer.set(summary_ref(user_id), {"version": SUMMARY_VERSION, "built_at": firestore.SERVER_TIMESTAMP}, merge=True)
+
+
+# -------------------------------
+# Reconstruction
+# -------------------------------
+def compute_summaries(factures):
+    """Recalcule toutes les synthèses à partir d'un itérable de factures (dicts)."""
+    totals = {GLOBAL_ID: {}}
+    for facture in factures:
+        values = contribution(facture)
+        add_deltas(totals[GLOBAL_ID], values)
+        if facture.get("user_id"):
+            add_deltas(totals.setdefault(f"user_{facture['user_id']}", {}), values)
+    summaries = {}
+    for doc_id, values in totals.items():
+        doc = {"version": SUMMARY_VERSION}
+        for key, value in values.items():
+            if isinstance(key, tuple):
+                doc.setdefault(key[0], {})[key[1]] = value
+            else:
+                doc[key] = value
+        summaries[doc_id] = doc
+    return summaries
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Petit cache clé → valeur partagé par tout le processus (toutes les sessions Streamlit).
+    Chaque entrée expire après `ttl` secondes ; `max_entries` borne la taille.
+    Chaque invalidate() incrémente une génération : get_or_load ne stocke pas le résultat
+    d'un chargement commencé avant une invalidation (données d'avant l'écriture).
+    """
+
+    def __init__(self, ttl=60, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        # appelé avec self._lock tenu
+        if len(self._data) >= self.max_entries and key not in self._data:
+            # on libère d'abord les entrées expirées, puis la plus proche de l'expiration
+            now = time.monotonic()
+            for k in [k for k, (exp, _) in self._data.items() if exp < now]:
+                del self._data[k]
+            if len(self._data) >= self.max_entries:
+                del self._data[min(self._data, key=lambda k: self._data[k][0])]
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self._generation
+            value = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, value, ttl)
+        return value
+
+    def invalidate(self, predicate=None):
+        """Supprime les entrées dont la clé vérifie `predicate` (toutes si None)."""
+        with self._lock:
+            self._generation += 1
+            if predicate is None:
+                self._data.clear()
+                return
+            for k in [k for k in self._data if predicate(k)]:
+                del self._data[k]
+
+    def pop(self, key):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+
+_MISSING = object()
@@ -0,0 +1,253 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from firebase_admin import auth
+from firebase_admin_setup import get_db
+from firebase_utils import (
+    USERS_COLLECTION, invalidate_role, invalidate_users, normalize_email, require_firebase, set_role_claim
+)
+
+# -------------------------------
+# Import d'utilisateurs en masse (CSV / JSON)
+# -------------------------------
+# Le fichier est d'abord validé en entier (email, mot de passe, rôle, doublons) :
+# rien n'est créé s'il contient une erreur. Les comptes Firebase Auth sont ensuite
+# créés en parallèle sur un pool borné (IMPORT_WORKERS, pour rester sous les quotas
+# de l'API Auth) et les documents users/<email> écrits par batchs de
+# IMPORT_BATCH_SIZE. Chaque ligne terminée est notée dans un journal (JSON lines) :
+# relancer le même fichier reprend là où l'import s'était arrêté. Un compte Auth
+# déjà existant est réutilisé : son rôle actuel (s'il en a un) l'emporte sur celui
+# du fichier, sinon le rôle du fichier est ajouté à ses autres custom claims ; la
+# ligne est signalée à part.
+# Avec FIRESTORE_EMULATOR_HOST et FIREBASE_AUTH_EMULATOR_HOST (firebase emulators:start),
+# tout passe par les émulateurs locaux.
+IMPORT_WORKERS = int(os.environ.get("IMPORT_WORKERS", "8"))
+IMPORT_BATCH_SIZE = 400
+JOURNAL_DIR = os.environ.get("IMPORT_JOURNAL_DIR", "data/imports")
+
+ROLES = ("user", "admin")
+# Firebase Auth refuse les mots de passe de moins de 6 caractères
+MIN_PASSWORD_LENGTH = 6
+_EMAIL = re.compile(r"^[^@\s/]+@[^@\s/]+\.[^@\s/]+$")
+
+# statuts d'une ligne
+CREATED = "créé"
+EXISTING = "existant"
+AUTH_EXISTING = "compte Auth existant"
+SKIPPED = "déjà importé"
+FAILED = "erreur"
+
+
+class ImportFileError(Exception):
+    """Fichier illisible ou lignes invalides (errors : [(ligne, message)])."""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+# -------------------------------
+# Lecture et validation
+# -------------------------------
+def _records(content, filename):
+    """Lignes brutes [(numéro de ligne, dict)] d'un fichier CSV ou JSON."""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ImportFileError(f"JSON invalide : {e}")
+        if isinstance(data, dict):
+            data = data.get("users", [])
+        if not isinstance(data, list):
+            raise ImportFileError("JSON attendu : une liste d'utilisateurs ou {\"users\": [...]}")
+        return [(i, item if isinstance(item, dict) else {}) for i, item in enumerate(data, start=1)]
+    try:
+        dialect = csv.Sniffer().sniff(content[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(content), dialect=dialect)
+    if not reader.fieldnames or "email" not in [f.strip().lower() for f in reader.fieldnames]:
+        raise ImportFileError("CSV attendu avec une colonne email (et password, role)")
+    # numéro de ligne du fichier : l'en-tête est la ligne 1
+    return [
+        (i, {(k or "").strip().lower(): v for k, v in row.items()})
+        for i, row in enumerate(reader, start=2)
+    ]
+
+
+def parse_users(content, filename):
+    """
+    Lit et valide un fichier d'utilisateurs (colonnes / clés email, password, role).
+    Retourne [{ligne, email, password, role}] ; lève ImportFileError si une ligne est invalide.
+    """
+    rows, errors, seen = [], [], {}
+    for line, record in _records(content, filename):
+        email = str(record.get("email") or "").strip()
+        password = str(record.get("password") or "")
+        role = str(record.get("role") or "user").strip().lower()
+        if not _EMAIL.match(email):
+            errors.append((line, f"email invalide : {email!r}"))
+            continue
+        email = normalize_email(email)
+        if email in seen:
+            errors.append((line, f"{email} déjà présent ligne {seen[email]}"))
+            continue
+        seen[email] = line
+        if len(password) < MIN_PASSWORD_LENGTH:
+            errors.append((line, f"{email} : mot de passe de moins de {MIN_PASSWORD_LENGTH} caractères"))
+        if role not in ROLES:
+            errors.append((line, f"{email} : rôle {role!r} inconnu ({', '.join(ROLES)})"))
+        rows.append({"ligne": line, "email": email, "password": password, "role": role})
+    if errors:
+        raise ImportFileError(f"{len(errors)} ligne(s) invalide(s)", errors)
+    if not rows:
+        raise ImportFileError("Aucun utilisateur dans le fichier")
+    return rows
+
+
+# -------------------------------
+# Journal de reprise
+# -------------------------------
+def journal_path(content):
+    """Journal associé au contenu du fichier : réimporter le même fichier reprend l'import."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return os.path.join(JOURNAL_DIR, f"{hashlib.sha256(content).hexdigest()[:16]}.jsonl")
+
+
+def read_journal(path):
+    """Emails déjà importés d'après le journal → uid."""
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # dernière ligne tronquée par un arrêt brutal
+                done[entry["email"]] = entry.get("uid")
+    return done
+
+
+# -------------------------------
+# Import
+# -------------------------------
+def _auth_account(row):
+    """
+    Crée le compte Auth et y recopie le rôle ; retourne (row, uid, statut, message).
+    Pour un compte existant, le rôle de ses custom claims, s'il en a un, remplace celui
+    du fichier ; sinon le rôle du fichier est fusionné avec ses autres claims.
+    """
+    try:
+        uid = auth.create_user(email=row["email"], password=row["password"]).uid
+    except auth.EmailAlreadyExistsError:
+        user = auth.get_user_by_email(row["email"])
+        claims = user.custom_claims or {}
+        role = claims.get("role")
+        if not role:
+            # Firestore et Auth doivent porter le même rôle
+            set_role_claim(user.uid, row["role"], claims)
+            return row, user.uid, AUTH_EXISTING, f"rôle {row['role']} ajouté aux custom claims"
+        if role != row["role"]:
+            return row | {"role": role}, user.uid, AUTH_EXISTING, f"rôle {role} conservé (fichier : {row['role']})"
+        return row, user.uid, AUTH_EXISTING, "custom claims inchangés"
+    set_role_claim(uid, row["role"], {})
+    return row, uid, CREATED, ""
+
+
+def import_users(rows, journal=None, progress=None, workers=IMPORT_WORKERS):
+    """
+    Importe des utilisateurs validés par parse_users.
+    Retourne une liste de résultats {ligne, email, role, statut, uid, message}, dans
+    l'ordre du fichier. progress(n) reçoit le nombre de lignes traitées.
+    """
+    require_firebase()
+    users = get_db().collection(USERS_COLLECTION)
+    done = read_journal(journal)
+    results = {}
+    todo = []
+    for row in rows:
+        if row["email"] in done:
+            results[row["email"]] = _result(row, SKIPPED, done[row["email"]])
+        else:
+            todo.append(row)
+
+    # documents Firestore déjà présents : compte existant, laissé tel quel (ni Auth ni rôle modifiés)
+    existing = set()
+    for start in range(0, len(todo), IMPORT_BATCH_SIZE):
+        refs = [users.document(row["email"]) for row in todo[start:start + IMPORT_BATCH_SIZE]]
+        existing.update(snap.id for snap in get_db().get_all(refs, field_paths=["email"]) if snap.exists)
+
+    if journal:
+        os.makedirs(os.path.dirname(journal) or ".", exist_ok=True)
+    log = open(journal, "a", encoding="utf-8") if journal else None
+    pending = []  # (row, uid, statut, message) en attente d'écriture Firestore
+
+    def record(row, uid, status, message=""):
+        results[row["email"]] = _result(row, status, uid, message)
+        if log is not None and status != FAILED:
+            log.write(json.dumps({"email": row["email"], "uid": uid}) + "\n")
+            log.flush()
+        if progress is not None:
+            progress(len(results))
+
+    def flush():
+        batch = get_db().batch()
+        for row, uid, _, _ in pending:
+            batch.set(users.document(row["email"]), {
+                "email": row["email"],
+                "password": row["password"],   # ⚠️ même format que create_user (à hasher en prod)
+                "role": row["role"],
+                "user_id": uid,
+            })
+        try:
+            batch.commit()
+        except Exception as e:
+            logging.error(f"Import : écriture de {len(pending)} utilisateur(s) en échec : {e}")
+            for row, uid, _, _ in pending:
+                record(row, uid, FAILED, f"Firestore : {e}")
+        else:
+            for row, uid, status, message in pending:
+                record(row, uid, status, message)
+        pending.clear()
+
+    try:
+        # le pool est propre à l'import : les lectures des pages (components.fetch) n'attendent pas
+        for row in todo:
+            if row["email"] in existing:
+                record(row, None, EXISTING, "document utilisateur déjà présent")
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="import") as executor:
+            futures = {executor.submit(_auth_account, row): row for row in todo if row["email"] not in existing}
+            for future in as_completed(futures):
+                row = futures[future]
+                try:
+                    pending.append(future.result())
+                except Exception as e:
+                    logging.error(f"Import : compte {row['email']} non créé : {e}")
+                    record(row, None, FAILED, str(e))
+                    continue
+                if len(pending) >= IMPORT_BATCH_SIZE:
+                    flush()
+        if pending:
+            flush()
+    finally:
+        if log is not None:
+            log.close()
+        for row in todo:
+            invalidate_role(row["email"])
+        invalidate_users()
+
+    return [results[row["email"]] for row in rows]
+
+
+def _result(row, status, uid=None, message=""):
+    return {"ligne": row["ligne"], "email": row["email"], "role": row["role"],
+            "statut": status, "uid": uid, "message": message}
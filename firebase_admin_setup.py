@@ -1,6 +1,6 @@
-import os, json, base64
+import os, json, base64, threading
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials
 
 def _from_streamlit_secrets():
     try:
@@ -42,15 +42,29 @@ def _from_file():
         return credentials.Certificate(info), info.get("project_id")
     return None, None
 
+class _EmulatorCredential(credentials.Base):
+    """Identifiants anonymes : les émulateurs Firebase n'authentifient pas le SDK Admin."""
+
+    def get_credential(self):
+        from google.auth.credentials import AnonymousCredentials
+        return AnonymousCredentials()
+
+def _from_emulator():
+    # FIRESTORE_EMULATOR_HOST=localhost:8080 (et FIREBASE_AUTH_EMULATOR_HOST) → émulateurs locaux
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        project_id = os.environ.get("GCLOUD_PROJECT", "demo-facturation")
+        return _EmulatorCredential(), project_id
+    return None, None
+
 def init_firebase():
     if firebase_admin._apps:
         return firebase_admin.get_app()
 
-    for loader in (_from_streamlit_secrets, _from_env_json, _from_env_base64, _from_file):
+    for loader in (_from_emulator, _from_streamlit_secrets, _from_env_json, _from_env_base64, _from_file):
         cred, project_id = loader()
         if cred:
             return firebase_admin.initialize_app(cred, {
-                "project_id": project_id
+                "projectId": project_id
             })
 
     try:
@@ -58,5 +72,44 @@ def init_firebase():
     except Exception:
         return None
 
-app = init_firebase()
-db = firestore.client() if app else None
+# -------------------------------
+# Client partagé, initialisé à la première utilisation
+# -------------------------------
+# L'import de ce module ne contacte plus rien : l'application Firebase et le client
+# Firestore (et son canal gRPC) sont créés au premier appel de get_app() / get_db(),
+# une seule fois pour tout le processus (toutes les sessions et tous les threads).
+# Une page qui n'en a pas besoin (formulaire de connexion…) ne paie donc ni la
+# recherche des identifiants ni l'import de google.cloud.firestore.
+_lock = threading.RLock()  # get_db() appelle get_app() sous le verrou
+_resources = {}
+
+def _resource(name, factory):
+    if name not in _resources:
+        with _lock:
+            if name not in _resources:
+                _resources[name] = factory()
+    return _resources[name]
+
+def get_app():
+    """Application Firebase Admin partagée (None si aucun identifiant n'est disponible)."""
+    return _resource("app", init_firebase)
+
+def _create_client():
+    app = get_app()
+    if not app:
+        return None
+    from firebase_admin import firestore
+    return firestore.client(app)
+
+def get_db():
+    """Client Firestore partagé (None si Firebase n'a pas pu être initialisé)."""
+    return _resource("db", _create_client)
+
+def __getattr__(name):
+    # compatibilité : « from firebase_admin_setup import db, app » reste possible
+    # (l'initialisation a alors lieu à l'import du module appelant)
+    if name == "app":
+        return get_app()
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,50 @@
 import logging
-from firebase_admin_setup import db, app
+import os
+from firebase_admin_setup import get_app, get_db
 from firebase_admin import auth
+from components.ttl_cache import TTLCache
+
+USERS_COLLECTION = "users"
+
+# Rôles mis en cache par email pour tout le processus : un contrôle d'accès est une
+# lecture mémoire. set_user_role invalide l'entrée ; le TTL borne l'effet d'un
+# changement fait hors de l'application.
+ROLE_CACHE_TTL = int(os.environ.get("ROLE_CACHE_TTL", "600"))
+_role_cache = TTLCache(ttl=ROLE_CACHE_TTL, max_entries=1024)
+
+# Liste des utilisateurs (page Admin) servie depuis le cache entre deux modifications :
+# projection sans le mot de passe, invalidée par toute écriture faite ici.
+USERS_CACHE_TTL = int(os.environ.get("USERS_CACHE_TTL", "300"))
+USER_LIST_FIELDS = ["email", "role", "user_id"]
+_users_cache = TTLCache(ttl=USERS_CACHE_TTL, max_entries=1)
+# une écriture groupée de Firestore est limitée à 500 opérations
+ROLE_BATCH_SIZE = 500
+
+def normalize_email(email: str) -> str:
+    """Email normalisé, utilisé comme identifiant du document utilisateur."""
+    key = (email or "").strip().lower()
+    if not key or "/" in key:
+        raise ValueError(f"Email invalide : {email!r}")
+    return key
+
+def user_ref(email: str):
+    """Document users/<email normalisé> (lecture directe, sans requête)."""
+    return get_db().collection(USERS_COLLECTION).document(normalize_email(email))
 
 def require_firebase():
     """Vérifie que Firebase Admin est bien initialisé."""
-    if not app or not db:
+    if not get_app() or not get_db():
         raise RuntimeError("Firebase Admin non initialisé")
 
+def set_role_claim(user_id: str, role: str, claims: dict | None = None) -> None:
+    """
+    Écrit le rôle dans les custom claims Firebase Auth sans effacer les autres claims.
+    claims : claims actuels s'ils sont déjà connus (sinon relus depuis Auth).
+    """
+    if claims is None:
+        claims = auth.get_user(user_id).custom_claims or {}
+    auth.set_custom_user_claims(user_id, claims | {"role": role})
+
 def create_user(email: str, password: str, role: str = "user") -> str:
     """
     Crée un utilisateur dans Firebase Auth et stocke son rôle + mot de passe dans Firestore.
@@ -16,34 +54,104 @@ def create_user(email: str, password: str, role: str = "user") -> str:
     require_firebase()
     try:
         user = auth.create_user(email=email, password=password)
-        db.collection("users").document(user.uid).set({
-            "email": email,
+        # rôle recopié dans les custom claims (présents dans les jetons ID de l'utilisateur)
+        set_role_claim(user.uid, role, user.custom_claims or {})
+        user_ref(email).set({
+            "email": normalize_email(email),
             "password": password,   # ⚠️ à remplacer par un hash en prod
             "role": role,
             "user_id": user.uid     # ✅ stocker l'UID pour filtrer les factures
         })
+        _role_cache.set(normalize_email(email), role)
+        invalidate_users()
         logging.info(f"Utilisateur {email} créé avec rôle {role}")
         return user.uid
     except Exception as e:
         logging.error(f"Erreur lors de la création de l'utilisateur {email}: {e}")
         raise
 
+def _load_role(email: str) -> str | None:
+    doc = user_ref(email).get()
+    if doc.exists:
+        return doc.to_dict().get("role", "user")
+    return "user"
+
 def get_user_role(email: str) -> str | None:
     """
-    Récupère le rôle d'un utilisateur à partir de son email.
+    Récupère le rôle d'un utilisateur à partir de son email (cache mémoire, puis Firestore).
     Retourne 'user' par défaut si aucun rôle n'est défini.
     """
     require_firebase()
     try:
-        user = auth.get_user_by_email(email)
-        doc = db.collection("users").document(user.uid).get()
-        if doc.exists:
-            return doc.to_dict().get("role", "user")
-        return "user"
+        key = normalize_email(email)
+        return _role_cache.get_or_load(key, lambda: _load_role(key))
     except Exception as e:
         logging.warning(f"Erreur lors de la récupération du rôle pour {email}: {e}")
         return None
 
+def set_user_role(email: str, role: str, user_id: str | None = None) -> None:
+    """
+    Change le rôle d'un utilisateur : document Firestore, custom claims Firebase Auth
+    et cache des rôles.
+    """
+    if user_id is None:
+        user_id = (user_ref(email).get(field_paths=["user_id"]).to_dict() or {}).get("user_id")
+    set_user_roles([(email, role, user_id)])
+
+def set_user_roles(changes) -> list:
+    """
+    Applique plusieurs changements de rôle [(email, rôle, user_id)] en une écriture
+    groupée (un batch par tranche de ROLE_BATCH_SIZE), puis met à jour les custom
+    claims et les caches. Retourne les emails dont les claims n'ont pas pu être mis à jour
+    (dont les comptes historiques sans user_id, qui n'ont pas de compte Firebase Auth).
+    """
+    require_firebase()
+    changes = list(changes)
+    for start in range(0, len(changes), ROLE_BATCH_SIZE):
+        batch = get_db().batch()
+        for email, role, _ in changes[start:start + ROLE_BATCH_SIZE]:
+            batch.update(user_ref(email), {"role": role})
+        # tout ou rien par batch : un document absent fait échouer la tranche entière
+        batch.commit()
+    claims_failed = []
+    for email, role, user_id in changes:
+        if not user_id:
+            # compte historique sans compte Firebase Auth : seul Firestore fait foi
+            logging.warning(f"Custom claims non mis à jour pour {email}: aucun user_id")
+            claims_failed.append(email)
+        else:
+            try:
+                set_role_claim(user_id, role)
+            except Exception as e:
+                logging.warning(f"Custom claims non mis à jour pour {email}: {e}")
+                claims_failed.append(email)
+        invalidate_role(email)
+        logging.info(f"Rôle de {email} changé en {role}")
+    invalidate_users()
+    return claims_failed
+
+def list_users() -> list:
+    """Utilisateurs [{id, email, role, user_id}] triés par email (cache partagé)."""
+    require_firebase()
+
+    def load():
+        docs = get_db().collection(USERS_COLLECTION).select(USER_LIST_FIELDS).stream()
+        users = [{"id": doc.id, "role": "user"} | (doc.to_dict() or {}) for doc in docs]
+        return sorted(users, key=lambda u: (u.get("email") or "").lower())
+
+    return _users_cache.get_or_load("all", load)
+
+def invalidate_users() -> None:
+    """Oublie la liste des utilisateurs en cache (rechargée au prochain list_users)."""
+    _users_cache.invalidate()
+
+def invalidate_role(email: str | None = None) -> None:
+    """Oublie le rôle en cache d'un utilisateur (de tous si email est None)."""
+    if email is None:
+        _role_cache.invalidate()
+    else:
+        _role_cache.pop(normalize_email(email))
+
 def verify_user(email: str, password: str) -> dict | None:
     """
     Vérifie si un utilisateur existe avec email + mot de passe.
@@ -53,23 +161,43 @@ def verify_user(email: str, password: str) -> dict | None:
     """
     require_firebase()
     try:
-        users_ref = db.collection("users").where("email", "==", email).stream()
-        for u in users_ref:
-            data = u.to_dict()
-            if data.get("password") == password:  # ⚠️ comparer un hash en prod
-                return {
-                    "role": data.get("role", "user"),
-                    "user_id": data.get("user_id", u.id),  # ✅ récupère l'UID
-                    "email": data.get("email")
-                }
+        doc = user_ref(email).get()
+        if doc.exists:
+            data = doc.to_dict()
+        else:
+            # compte pas encore migré (migrate_users.py) : recherche historique, puis
+            # recopie sous son email pour que la prochaine connexion soit une lecture directe
+            data = _migrate_legacy(email)
+        if data and data.get("password") == password:  # ⚠️ comparer un hash en prod
+            # le document vient d'être lu : le rôle est mis en cache pour les contrôles d'accès
+            _role_cache.set(normalize_email(email), data.get("role", "user"))
+            return {
+                "role": data.get("role", "user"),
+                "user_id": data.get("user_id"),  # ✅ récupère l'UID
+                "email": data.get("email")
+            }
         return None
     except Exception as e:
         logging.error(f"Erreur lors de la vérification de l'utilisateur {email}: {e}")
         return None
 
+def _migrate_legacy(email: str) -> dict | None:
+    for doc in get_db().collection(USERS_COLLECTION).where("email", "==", email.strip()).limit(1).stream():
+        data = doc.to_dict() | {"email": normalize_email(email)}
+        data.setdefault("user_id", doc.id)
+        # copie et suppression dans le même batch (comme migrate_users.py) : pas d'état intermédiaire
+        batch = get_db().batch()
+        batch.set(user_ref(email), data)
+        batch.delete(doc.reference)
+        batch.commit()
+        invalidate_users()
+        logging.info(f"Utilisateur {email} migré vers users/{normalize_email(email)}")
+        return data
+    return None
+
 def is_admin(email: str) -> bool:
     """
-    Vérifie si l'utilisateur est un administrateur.
+    Vérifie si l'utilisateur est un administrateur (lecture mémoire hors premier appel).
     """
     role = get_user_role(email)
     return role == "admin"
@@ -0,0 +1,63 @@
+"""
+Importe des utilisateurs en masse depuis un fichier CSV ou JSON.
+
+CSV : colonnes email, password, role (role facultatif, "user" par défaut ; séparateur , ; ou tabulation).
+JSON : [{"email": ..., "password": ..., "role": ...}, ...] ou {"users": [...]}.
+
+Le fichier est validé en entier avant toute création. En cas d'interruption ou
+d'erreur, relancer la même commande reprend l'import (journal dans data/imports/).
+Pour tester sur les émulateurs (firebase emulators:start) :
+    FIRESTORE_EMULATOR_HOST=localhost:8080 FIREBASE_AUTH_EMULATOR_HOST=localhost:9099 python import_users.py ...
+
+    python import_users.py data/users.example.csv --check   # valide le fichier d'exemple
+    python import_users.py equipe.csv                       # importe
+    python import_users.py equipe.json --workers 4
+"""
+import argparse
+import sys
+
+from components.user_import import (
+    FAILED, IMPORT_WORKERS, ImportFileError, import_users, journal_path, parse_users
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="fichier .csv ou .json")
+    parser.add_argument("--check", action="store_true", help="valide le fichier sans rien créer")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="comptes créés en parallèle")
+    parser.add_argument("--journal", help="journal de reprise (par défaut : dérivé du contenu du fichier)")
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        content = f.read()
+    try:
+        rows = parse_users(content, args.file)
+    except ImportFileError as e:
+        print(f"❌ {e}")
+        for line, message in e.errors:
+            print(f"   ligne {line} : {message}")
+        sys.exit(1)
+    print(f"✅ {len(rows)} utilisateur(s) valides")
+    if args.check:
+        return
+
+    journal = args.journal or journal_path(content)
+    results = import_users(
+        rows, journal=journal, workers=args.workers,
+        progress=lambda n: print(f"\r⏳ {n}/{len(rows)}", end="", flush=True),
+    )
+    print()
+    counts = {}
+    for r in results:
+        counts[r["statut"]] = counts.get(r["statut"], 0) + 1
+        if r["statut"] == FAILED:
+            print(f"❌ ligne {r['ligne']} {r['email']} : {r['message']}")
+    print(" | ".join(f"{status} : {n}" for status, n in counts.items()))
+    if counts.get(FAILED):
+        print(f"Relancez la même commande pour reprendre (journal : {journal})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
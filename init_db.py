@@ -1,26 +1,16 @@
-import sqlite3
-import os
+import sys
 
-# Vérifier que le dossier data existe
-os.makedirs("data", exist_ok=True)
+from components.replica import REPLICA_PATH, connect, init_schema, sync
 
-# Connexion à la base (créera data/factures.db si absent)
-conn = sqlite3.connect("data/factures.db")
-cursor = conn.cursor()
-
-# Création de la table avec toutes les colonnes nécessaires
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS factures (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    type TEXT,
-    client TEXT,
-    montant REAL,
-    objet TEXT,
-    date TEXT
-)
-""")
-
-conn.commit()
+# Création (ou mise à niveau) du réplica SQLite local des factures Firestore
+# Usage : python init_db.py [--sync]   (--sync : synchronisation complète immédiate ;
+# sinon elle est lancée en arrière-plan à la première lecture, les pages lisant Firestore en attendant)
+conn = connect()
+init_schema(conn)
 conn.close()
 
-print("✅ Base de données factures.db créée avec succès dans le dossier data/")
+print(f"✅ Réplica des factures prêt : {REPLICA_PATH}")
+
+if "--sync" in sys.argv:
+    sync(full=True)
+    print("✅ Synchronisation complète terminée")
@@ -0,0 +1,76 @@
+"""
+Migre les documents de la collection "users" vers des identifiants = email normalisé.
+
+Les comptes créés depuis la page Admin avaient un identifiant aléatoire (add()),
+ceux de l'inscription l'UID Firebase : la connexion devait donc faire une requête
+sur le champ email. Après migration, users/<email> est lu directement.
+Le champ user_id (qui relie les factures à l'utilisateur) est conservé tel quel.
+
+    python migrate_users.py            # affiche ce qui serait fait
+    python migrate_users.py --apply    # migre (copie puis supprime l'ancien document)
+"""
+import argparse
+
+from firebase_admin_setup import db
+from firebase_utils import USERS_COLLECTION, normalize_email
+
+
+def plan():
+    """Retourne (migrations [(ancien doc, nouvel id, données)], doublons, invalides)."""
+    docs = list(db.collection(USERS_COLLECTION).stream())
+    existing = {doc.id for doc in docs}
+    migrations, duplicates, invalid = [], [], []
+    targets = set()
+    for doc in docs:
+        data = doc.to_dict()
+        try:
+            key = normalize_email(data.get("email", ""))
+        except ValueError:
+            invalid.append(doc.id)
+            continue
+        if doc.id == key:
+            continue
+        if key in targets or (key in existing and key != doc.id):
+            duplicates.append((doc.id, key))
+            continue
+        targets.add(key)
+        migrations.append((doc, key, data | {"email": key, "user_id": data.get("user_id") or doc.id}))
+    return migrations, duplicates, invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="effectue la migration")
+    args = parser.parse_args()
+
+    migrations, duplicates, invalid = plan()
+    for doc, key, _ in migrations:
+        print(f"➡️  users/{doc.id} → users/{key}")
+    for old_id, key in duplicates:
+        print(f"⚠️ users/{old_id} : users/{key} existe déjà, document laissé en place (à vérifier)")
+    for old_id in invalid:
+        print(f"⚠️ users/{old_id} : email manquant ou invalide, document laissé en place")
+
+    if not migrations:
+        print("✅ Rien à migrer")
+        return
+    if not args.apply:
+        print(f"{len(migrations)} document(s) à migrer : relancez avec --apply")
+        return
+
+    users = db.collection(USERS_COLLECTION)
+    batch, pending = db.batch(), 0
+    for doc, key, data in migrations:
+        # copie et suppression dans le même batch : pas d'état intermédiaire visible
+        batch.set(users.document(key), data)
+        batch.delete(doc.reference)
+        pending += 2
+        if pending >= 400:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    batch.commit()
+    print(f"✅ {len(migrations)} utilisateur(s) migré(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-from firebase_admin_setup import db   # ton module qui initialise Firebase
-import uuid
+from firebase_utils import create_user, invalidate_users, list_users, set_user_roles
+from components.pagination import PAGE_SIZES
+from components.session import current_user, end_session
 
 # -------------------------------
 # Configuration
@@ -11,21 +12,21 @@ st.set_page_config(page_title="Gestion des utilisateurs", page_icon="👥", layo
 # -------------------------------
 # Vérification d'authentification et rôle
 # -------------------------------
-if "authenticated" not in st.session_state:
-    st.session_state["authenticated"] = False
-
-# 👉 Vérifie si connecté
-if not st.session_state["authenticated"]:
+# 👉 Vérifie si connecté (jeton de session signé, vérifié localement)
+current = current_user()
+if current is None:
     st.warning("⚠️ Veuillez vous connecter d'abord.")
     st.switch_page("pages/Login.py")
     st.stop()
 
-# 👉 Vérifie si admin
-if st.session_state.get("role") != "admin":
+# 👉 Vérifie si admin (rôle du cache des rôles, réaligné par current_user)
+if current["role"] != "admin":
     st.warning("⛔ Accès réservé. Veuillez contacter votre administrateur.")
     st.switch_page("app.py")
     st.stop()
 
+import pandas as pd
+
 # -------------------------------
 # Barre de navigation moderne
 # -------------------------------
@@ -49,7 +50,7 @@ elif selected == "🧾 Factures":
 elif selected == "💰 Reçus":
     st.switch_page("pages/Previsualisation.py")
 elif selected == "🔒 Déconnexion":
-    st.session_state["authenticated"] = False
+    end_session()
     st.info("✅ Déconnecté")
     st.switch_page("pages/Login.py")
 
@@ -70,40 +71,133 @@ with st.form("signup_form"):
 
     if submit:
         if email and password:
-            # Générer un identifiant unique
-            user_id = str(uuid.uuid4())   # ou simplement utiliser l'email comme identifiant
-
-            user_doc = {
-                "user_id": user_id,        # 👉 champ ajouté
-                "email": email,
-                "password": password,      # ⚠️ à hasher en production
-                "role": role
-            }
-            db.collection("users").add(user_doc)
-            st.success(f"✅ Utilisateur {email} créé avec rôle {role}")
+            # compte Firebase Auth + document users/<email> (même chemin que l'inscription)
+            try:
+                create_user(email, password, role)
+                st.success(f"✅ Utilisateur {email} créé avec rôle {role}")
+            except Exception as e:
+                st.error(f"❌ Création impossible : {e}")
         else:
             st.error("❌ Email et mot de passe requis")
 
+# --- Import en masse (CSV / JSON) ---
+with st.expander("📥 Importer des utilisateurs (CSV / JSON)"):
+    st.caption("Colonnes email, password, role (role facultatif, « user » par défaut). "
+               "Réimporter le même fichier reprend un import interrompu.")
+    fichier = st.file_uploader("Fichier", type=["csv", "json"], key="users_import_file")
+    if fichier is not None:
+        from components.user_import import FAILED, ImportFileError, import_users, journal_path, parse_users
+
+        content = fichier.getvalue()
+        try:
+            rows = parse_users(content, fichier.name)
+        except ImportFileError as e:
+            st.error(f"❌ {e}")
+            if e.errors:
+                st.dataframe(pd.DataFrame(e.errors, columns=["ligne", "erreur"]), hide_index=True)
+        else:
+            st.success(f"✅ {len(rows)} utilisateur(s) valides")
+            if st.button(f"📥 Importer {len(rows)} utilisateur(s)", key="users_import_run"):
+                progress_bar = st.progress(0.0)
+                results = import_users(
+                    rows, journal=journal_path(content),
+                    progress=lambda n: progress_bar.progress(n / len(rows), text=f"⏳ {n}/{len(rows)}"),
+                )
+                failed = [r for r in results if r["statut"] == FAILED]
+                if failed:
+                    st.warning(f"⚠️ {len(failed)} ligne(s) en erreur : relancez l'import pour les reprendre")
+                else:
+                    st.success("✅ Import terminé")
+                st.dataframe(pd.DataFrame(results).drop(columns=["uid"]), hide_index=True, use_container_width=True)
+
 # --- Liste des utilisateurs avec modification de rôle ---
+# Grille paginée servie depuis le cache (list_users) ; les rôles modifiés dans la
+# grille s'accumulent dans la session et sont enregistrés ensemble en un seul batch.
 st.subheader("📋 Liste des utilisateurs")
-users = db.collection("users").stream()
-
-for user in users:
-    u = user.to_dict()
-    user_id = user.id
-    col1, col2, col3 = st.columns([3, 2, 2])
-    with col1:
-        st.write(f"📧 {u.get('email')}")
-    with col2:
-        st.write(f"Rôle actuel : {u.get('role')}")
-    with col3:
-        new_role = st.selectbox(
-            f"Changer rôle ({u.get('email')})",
-            ["user", "admin"],
-            index=0 if u.get("role") == "user" else 1,
-            key=f"role_{user_id}"
-        )
-        if st.button(f"✅ Appliquer ({u.get('email')})", key=f"apply_{user_id}"):
-            db.collection("users").document(user_id).update({"role": new_role})
-            st.success(f"🔄 Rôle de {u.get('email')} mis à jour en {new_role}")
-            st.experimental_rerun()
+ROLES = ["user", "admin"]
+PENDING_KEY = "_pending_roles"
+pending = st.session_state.setdefault(PENDING_KEY, {})
+
+users = list_users()
+by_email = {u.get("email"): u for u in users}
+
+col_search, col_size, col_refresh = st.columns([3, 1, 1])
+with col_search:
+    search = st.text_input("🔍 Rechercher (email ou rôle)", key="users_search").strip().lower()
+with col_size:
+    page_size = st.selectbox("Lignes par page", PAGE_SIZES, key="users_page_size")
+with col_refresh:
+    st.write("")
+    st.button("🔄 Actualiser", key="users_refresh", on_click=invalidate_users)
+
+filtered = [
+    u for u in users
+    if not search or search in (u.get("email") or "").lower() or search == pending.get(u.get("email"), u.get("role"))
+]
+nb_pages = max(1, -(-len(filtered) // page_size))
+# une recherche plus restrictive peut réduire le nombre de pages sous la page affichée
+if st.session_state.get("users_page", 1) > nb_pages:
+    st.session_state["users_page"] = nb_pages
+page = st.number_input(f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, value=1, step=1, key="users_page") - 1
+visible = filtered[page * page_size:(page + 1) * page_size]
+st.caption(f"{len(filtered)} utilisateur(s) sur {len(users)}")
+
+# les modifications en attente sont réaffichées quand on revient sur une page
+grid = pd.DataFrame(
+    [{"email": u.get("email"), "role": pending.get(u.get("email"), u.get("role")), "user_id": u.get("user_id")} for u in visible],
+    columns=["email", "role", "user_id"],
+)
+edited = st.data_editor(
+    grid,
+    key=f"users_grid_{search}_{page_size}_{page}",
+    hide_index=True,
+    use_container_width=True,
+    disabled=["email", "user_id"],
+    column_config={
+        "email": st.column_config.TextColumn("Email"),
+        "role": st.column_config.SelectboxColumn("Rôle", options=ROLES, required=True),
+        "user_id": st.column_config.TextColumn("UID"),
+    },
+)
+for row in edited.to_dict("records"):
+    stored = by_email.get(row["email"], {}).get("role")
+    if row["role"] == stored:
+        pending.pop(row["email"], None)
+    else:
+        pending[row["email"]] = row["role"]
+
+
+def enregistrer_roles():
+    changes = [(email, role, by_email[email].get("user_id")) for email, role in pending.items() if email in by_email]
+    try:
+        claims_failed = set_user_roles(changes)
+    except Exception as e:
+        st.session_state["_roles_message"] = ("error", f"❌ Rôles non modifiés ({e}). Compte non migré ? Lancez migrate_users.py")
+        return
+    pending.clear()
+    message = f"✅ {len(changes)} rôle(s) mis à jour"
+    if claims_failed:
+        message += f" (custom claims non mis à jour : {', '.join(claims_failed)})"
+    st.session_state["_roles_message"] = ("success", message)
+
+
+def annuler_roles():
+    pending.clear()
+    # la grille repart des rôles enregistrés
+    for key in [k for k in st.session_state if str(k).startswith("users_grid_")]:
+        del st.session_state[key]
+
+
+if pending:
+    if pending.get(current["email"]) == "user":
+        st.warning("⚠️ Vous retirez votre propre rôle administrateur")
+    st.info("Modifications en attente : " + ", ".join(f"{email} → {role}" for email, role in sorted(pending.items())))
+    col_save, col_cancel = st.columns(2)
+    with col_save:
+        st.button(f"💾 Enregistrer {len(pending)} modification(s)", key="users_save", type="primary", on_click=enregistrer_roles)
+    with col_cancel:
+        st.button("↩️ Annuler", key="users_cancel", on_click=annuler_roles)
+
+message = st.session_state.pop("_roles_message", None)
+if message:
+    getattr(st, message[0])(message[1])
@@ -1,10 +1,19 @@
 # pages/Admin_dashboard.py
 
+import os
 import streamlit as st
-import pandas as pd
-from matplotlib import pyplot as plt
 from streamlit_option_menu import option_menu
-from firebase_admin_setup import db
+from datetime import date
+from components.bulk_export import EXPORT_MAX_FILES, export_factures_zip
+from components.factures_stats import admin_kpis
+from components.factures_repo import (
+    load_factures, load_unpaid, page_factures, query_factures, iter_factures,
+    get_facture, delete_facture, delete_all_factures, mark_factures_paid
+)
+from components.fetch import fetch_all
+from components.session import current_user, end_session
+from components.pagination import paginated_table
+from components.payments import record_payment, recent_paiements, PaymentError
 
 # -------------------------------
 # Page config
@@ -14,20 +23,23 @@ st.set_page_config(page_title="Admin - Gestion factures", page_icon="🔧", layo
 # -------------------------------
 # Authentification (sécurisé)
 # -------------------------------
-if "authenticated" not in st.session_state:
-    st.session_state["authenticated"] = False
-
-if not st.session_state["authenticated"]:
+# jeton de session signé vérifié localement (pas de lecture Firestore)
+current = current_user()
+if current is None:
     st.error("⛔ Vous devez être connecté")
     st.stop()
 
-role = st.session_state.get("role", "user")
-user_id = st.session_state.get("user_id")
+role = current["role"]
+user_id = current["user_id"]
 
+# rôle issu du cache des rôles (current_user) : le même sert au contrôle d'accès et au périmètre des données
 if role != "admin":
     st.error("⛔ Accès réservé à l'administrateur")
     st.stop()
 
+# pandas n'est chargé qu'une fois l'accès vérifié ; matplotlib seulement pour un graphique
+import pandas as pd
+
 # -------------------------------
 # Sidebar navigation (admin)
 # -------------------------------
@@ -42,6 +54,7 @@ with st.sidebar:
     )
 
     if selected == "🔒 Déconnexion":
+        end_session()
         st.session_state.clear()
         st.success("✅ Déconnecté")
         st.experimental_rerun()
@@ -49,32 +62,28 @@ with st.sidebar:
 # -------------------------------
 # Chargement : admin voit toutes les factures
 # -------------------------------
-factures_ref = db.collection("factures").stream()
-rows = [doc.to_dict() | {"id": doc.id} for doc in factures_ref]
-df = pd.DataFrame(rows)
-
-# Normaliser colonnes numériques si présentes
-for col in ["montant", "montant_total", "montant_paye", "reliquat"]:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
+# lectures indépendantes lancées en parallèle : la page attend la plus lente, pas leur somme
+donnees, erreurs = fetch_all({
+    "kpis": admin_kpis,
+    "impayes": lambda: load_unpaid(role, user_id),
+    "paiements": recent_paiements,
+})
+if erreurs:
+    st.warning(f"⚠️ Données partiellement chargées ({', '.join(erreurs)}) : réessayez dans un instant")
 st.title("🔧 Admin — Gestion complète des factures")
 
 # -------------------------------
 # Vue d'ensemble / métriques
 # -------------------------------
 st.subheader("📊 Aperçu global")
-if not df.empty:
-    total_factures = df[df.get("type") == "Facture de doit"]["montant"].sum() if "type" in df.columns else 0
-    total_recus = df[df.get("type") == "Reçu de Paiement"]["montant"].sum() if "type" in df.columns else 0
-    total_global = df["montant"].sum() if "montant" in df.columns else 0
-    total_impayes = int((df["reliquat"] > 0).sum()) if "reliquat" in df.columns else 0
-
+# Synthèse (ou agrégations Firestore) : coût constant quelle que soit la taille de la collection
+kpis = donnees.get("kpis")
+if kpis and kpis["nb_factures"]:
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("💼 Factures (montant)", f"{total_factures:,.0f} FCFA")
-    c2.metric("💰 Reçus (montant)", f"{total_recus:,.0f} FCFA")
-    c3.metric("📊 Total (montant)", f"{total_global:,.0f} FCFA")
-    c4.metric("❌ Factures impayées", f"{total_impayes}")
+    c1.metric("💼 Factures (montant)", f"{kpis['total_factures']:,.0f} FCFA")
+    c2.metric("💰 Reçus (montant)", f"{kpis['total_recus']:,.0f} FCFA")
+    c3.metric("📊 Total (montant)", f"{kpis['total_global']:,.0f} FCFA")
+    c4.metric("❌ Factures impayées", f"{kpis['nb_impayees']}")
 else:
     st.info("Aucune facture trouvée")
 
@@ -84,11 +93,26 @@ st.markdown("---")
 # Table complète des factures (admin)
 # -------------------------------
 st.subheader("📋 Toutes les factures")
-if df.empty:
-    st.info("Aucune facture à afficher")
+# Pagination par curseur : seule la page affichée est lue dans Firestore
+paginated_table(
+    "admin_factures",
+    lambda size, cursor: page_factures(role, user_id, page_size=size, start_after=cursor),
+)
+
+st.markdown("---")
+
+# -------------------------------
+# Derniers paiements (toutes factures)
+# -------------------------------
+st.subheader("💳 Derniers paiements")
+paiements = donnees.get("paiements", [])
+if paiements:
+    st.dataframe(
+        pd.DataFrame(paiements).reindex(columns=["date", "facture_id", "montant", "mode", "user_id"]),
+        use_container_width=True,
+    )
 else:
-    # Afficher un aperçu triable
-    st.dataframe(df.reset_index(drop=True), use_container_width=True)
+    st.info("Aucun paiement enregistré")
 
 st.markdown("---")
 
@@ -97,65 +121,64 @@ st.markdown("---")
 # -------------------------------
 st.subheader("❌ Gestion des factures impayées")
 
+# filtre reliquat > 0 appliqué par Firestore : seules les factures impayées sont transférées
+impayes = pd.DataFrame(donnees.get("impayes", []))
 cols_needed = {"reliquat", "montant_paye", "montant_total", "client_name"}
-if not cols_needed.issubset(df.columns):
+if impayes.empty:
+    st.info("✅ Aucune facture impayée")
+elif not cols_needed.issubset(impayes.columns):
     st.info("Les colonnes nécessaires (reliquat, montant_paye, montant_total, client_name) sont manquantes.")
 else:
-    impayes = df[df["reliquat"] > 0].copy()
-    if impayes.empty:
-        st.info("✅ Aucune facture impayée")
-    else:
-        # Tableau synthétique des impayés
-        tableau_impayes = impayes[["id", "client_name", "client_phone", "montant_total", "montant_paye", "reliquat"]]
-        st.dataframe(tableau_impayes.reset_index(drop=True), use_container_width=True)
-
-        # Sélection lisible (client + téléphone + montant)
-        def label(i):
-            r = impayes.iloc[i]
-            phone = r.get("client_phone", "")
-            return f"{r['client_name']} — {phone} — Total {int(r['montant_total'])} FCFA — Reliquat {int(r['reliquat'])} FCFA"
-
-        options = [label(i) for i in range(len(impayes))]
-        option_to_index = {options[i]: i for i in range(len(options))}
-
-        selected = st.selectbox("Sélectionnez une facture à solder", options=options, key="admin_select_impaye")
-        if selected:
-            idx = option_to_index[selected]
-            facture = impayes.iloc[idx]
-
-            st.markdown(f"**Facture sélectionnée :** {facture['id']} — **Client :** {facture['client_name']}")
-            st.write(f"**Payé :** {int(facture['montant_paye'])} FCFA  •  **Total :** {int(facture['montant_total'])} FCFA  •  **Reliquat :** {int(facture['reliquat'])} FCFA")
-
-            montant_paye_input = st.number_input(
-                "Montant à enregistrer (FCFA)",
-                min_value=0,
-                max_value=int(facture["reliquat"]),
-                step=100,
-                key=f"admin_montant_paye_{facture['id']}"
-            )
-
-            col_a, col_b = st.columns([1, 1])
-            with col_a:
-                if st.button("Enregistrer paiement", key=f"admin_save_pay_{facture['id']}"):
-                    nouveau_montant_paye = float(facture["montant_paye"]) + float(montant_paye_input)
-                    nouveau_reliquat = float(facture["montant_total"]) - nouveau_montant_paye
-                    nouveau_reliquat = max(nouveau_reliquat, 0)
-
-                    db.collection("factures").document(facture["id"]).update({
-                        "montant_paye": nouveau_montant_paye,
-                        "reliquat": nouveau_reliquat,
-                        "status": "payée" if nouveau_reliquat == 0 else "partielle"
-                    })
-                    st.success(f"Paiement enregistré. Nouveau reliquat : {int(nouveau_reliquat)} FCFA")
+    for col in ["montant_total", "montant_paye", "reliquat"]:
+        impayes[col] = pd.to_numeric(impayes[col], errors="coerce").fillna(0)
+    # Tableau synthétique des impayés
+    tableau_impayes = impayes[["id", "client_name", "client_phone", "montant_total", "montant_paye", "reliquat"]]
+    st.dataframe(tableau_impayes.reset_index(drop=True), use_container_width=True)
+
+    # Sélection lisible (client + téléphone + montant)
+    def label(i):
+        r = impayes.iloc[i]
+        phone = r.get("client_phone", "")
+        return f"{r['client_name']} — {phone} — Total {int(r['montant_total'])} FCFA — Reliquat {int(r['reliquat'])} FCFA"
+
+    options = [label(i) for i in range(len(impayes))]
+    option_to_index = {options[i]: i for i in range(len(options))}
+
+    selected = st.selectbox("Sélectionnez une facture à solder", options=options, key="admin_select_impaye")
+    if selected:
+        idx = option_to_index[selected]
+        facture = impayes.iloc[idx]
+
+        st.markdown(f"**Facture sélectionnée :** {facture['id']} — **Client :** {facture['client_name']}")
+        st.write(f"**Payé :** {int(facture['montant_paye'])} FCFA  •  **Total :** {int(facture['montant_total'])} FCFA  •  **Reliquat :** {int(facture['reliquat'])} FCFA")
+
+        montant_paye_input = st.number_input(
+            "Montant à enregistrer (FCFA)",
+            min_value=0,
+            max_value=int(facture["reliquat"]),
+            step=100,
+            key=f"admin_montant_paye_{facture['id']}"
+        )
+
+        col_a, col_b = st.columns([1, 1])
+        with col_a:
+            if st.button("Enregistrer paiement", key=f"admin_save_pay_{facture['id']}"):
+                # montants relus et incrémentés dans la transaction (pas depuis le tableau affiché)
+                try:
+                    paiement = record_payment(facture["id"], float(montant_paye_input), user_id=user_id, mode="manuel_admin")
+                except PaymentError as e:
+                    st.error(f"⛔ {e}")
+                else:
+                    st.success(f"Paiement enregistré. Nouveau reliquat : {int(paiement['reliquat'])} FCFA")
                     st.experimental_rerun()
 
-            with col_b:
-                if st.button("Solder complètement", key=f"admin_full_pay_{facture['id']}"):
-                    db.collection("factures").document(facture["id"]).update({
-                        "montant_paye": float(facture["montant_total"]),
-                        "reliquat": 0,
-                        "status": "payée"
-                    })
+        with col_b:
+            if st.button("Solder complètement", key=f"admin_full_pay_{facture['id']}"):
+                try:
+                    record_payment(facture["id"], user_id=user_id, mode="manuel_admin")
+                except PaymentError as e:
+                    st.error(f"⛔ {e}")
+                else:
                     st.success("Facture soldée ✅")
                     st.experimental_rerun()
 
@@ -167,6 +190,12 @@ st.markdown("---")
 if selected == "📊 Analyses" or st.sidebar.button("Voir analyses", key="admin_open_analyses"):
     st.subheader("📈 Analyses et visualisations")
 
+    # liste complète chargée seulement ici, à la demande (cache partagé entre deux écritures)
+    df = pd.DataFrame(load_factures(role, user_id))
+    for col in ["montant", "montant_total", "montant_paye", "reliquat"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
     if df.empty or "montant" not in df.columns:
         st.info("Pas assez de données pour afficher des graphiques")
     else:
@@ -176,6 +205,8 @@ if selected == "📊 Analyses" or st.sidebar.button("Voir analyses", key="admin_
 
         if st.button("Générer le graphique", key="admin_generate_chart"):
             try:
+                from matplotlib import pyplot as plt
+
                 fig, ax = plt.subplots(figsize=(8, 4))
                 if chart_type == "Barres":
                     df.groupby(col_x)[col_y].sum().plot(kind="bar", ax=ax)
@@ -192,6 +223,67 @@ if selected == "📊 Analyses" or st.sidebar.button("Voir analyses", key="admin_
 
 st.markdown("---")
 
+# -------------------------------
+# Export groupé des PDF (admin / comptabilité)
+# -------------------------------
+st.subheader("📦 Export groupé des factures")
+
+with st.expander("Exporter les PDF d'une période (ZIP)"):
+    today = date.today()
+    periode = st.date_input(
+        "Période",
+        value=(today.replace(day=1), today),
+        key="admin_export_periode"
+    )
+    col_t, col_s = st.columns(2)
+    with col_t:
+        export_type = st.selectbox("Type", ["Tous", "Facture de doit", "Reçu de Paiement"], key="admin_export_type")
+    with col_s:
+        export_status = st.selectbox("Statut", ["Tous", "Impayées", "Payées"], key="admin_export_status")
+
+    if st.button("📦 Préparer l'export", key="admin_export_run"):
+        if not isinstance(periode, (list, tuple)) or len(periode) != 2:
+            st.error("Sélectionnez une date de début et une date de fin")
+        else:
+            debut, fin = periode
+            # type, période et statut filtrés par Firestore
+            query = query_factures(
+                role, user_id,
+                type_doc=None if export_type == "Tous" else export_type,
+                date_from=debut,
+                date_to=fin,
+                unpaid={"Tous": None, "Impayées": True, "Payées": False}[export_status],
+                order_by=None,
+            )
+
+            status_text = st.empty()
+            archive_path, nb_pdf, echecs, complet = export_factures_zip(
+                # lecture par paquets : jamais tout en mémoire, et aucun flux ouvert pendant le rendu
+                iter_factures(query),
+                progress=lambda n: status_text.text(f"⏳ {n} PDF générés…"),
+            )
+            status_text.empty()
+            if nb_pdf == 0 and not echecs:
+                st.info("Aucune facture sur cette période")
+            else:
+                st.success(f"✅ {nb_pdf} PDF prêts")
+                if echecs:
+                    st.warning(f"⚠️ {len(echecs)} facture(s) non générée(s) : {', '.join(map(str, echecs))}")
+                if not complet:
+                    st.warning(f"⚠️ Export limité à {EXPORT_MAX_FILES} factures : réduisez la période pour le reste")
+                # fichier ouvert en lecture (BufferedReader) : pas de copie supplémentaire en bytes
+                with open(archive_path, "rb") as archive:
+                    st.download_button(
+                        "⬇️ Télécharger le ZIP",
+                        archive,
+                        file_name=f"factures_{debut:%Y%m%d}_{fin:%Y%m%d}.zip",
+                        mime="application/zip",
+                        key="admin_export_download"
+                    )
+            os.remove(archive_path)
+
+st.markdown("---")
+
 # -------------------------------
 # CRUD global (admin)
 # -------------------------------
@@ -206,39 +298,39 @@ with st.expander("Supprimer / modifier une facture"):
             if not facture_id:
                 st.error("Renseignez l'ID de la facture")
             else:
-                doc_ref = db.collection("factures").document(facture_id)
-                doc = doc_ref.get()
-                if not doc.exists:
+                facture_crud = get_facture(facture_id)
+                if facture_crud is None:
                     st.error("Facture introuvable")
                 else:
-                    doc_ref.delete()
+                    delete_facture(facture_id, user_id=facture_crud.get("user_id"))
                     st.success("Facture supprimée")
                     st.experimental_rerun()
 
     with col2:
         if st.button("🗂️ Marquer comme payée (status)", key="admin_mark_paid"):
-            if not facture_id:
+            # plusieurs identifiants possibles, séparés par des virgules ou des espaces
+            facture_ids = facture_id.replace(",", " ").split()
+            if not facture_ids:
                 st.error("Renseignez l'ID de la facture")
             else:
-                doc_ref = db.collection("factures").document(facture_id)
-                doc = doc_ref.get()
-                if not doc.exists:
-                    st.error("Facture introuvable")
-                else:
-                    data = doc.to_dict()
-                    montant_total = float(data.get("montant_total", 0))
-                    doc_ref.update({
-                        "montant_paye": montant_total,
-                        "reliquat": 0,
-                        "status": "payée"
-                    })
-                    st.success("Facture marquée comme payée")
+                result, introuvables = mark_factures_paid(facture_ids)
+                if introuvables:
+                    st.error(f"Facture(s) introuvable(s) : {', '.join(introuvables)}")
+                if result.failed:
+                    st.warning(f"⚠️ {len(result.failed)} mise(s) à jour en échec")
+                if result.done:
+                    st.success(f"{result.done} facture(s) marquée(s) comme payée(s)")
                     st.experimental_rerun()
 
 with st.expander("Supprimer toutes les factures"):
     if st.button("🗑️ Supprimer TOUTES les factures (IRRÉVERSIBLE)", key="admin_delete_all_confirm"):
-        docs = db.collection("factures").stream()
-        for d in docs:
-            db.collection("factures").document(d.id).delete()
-        st.warning("Toutes les factures ont été supprimées")
-        st.experimental_rerun()
+        status_text = st.empty()
+        result = delete_all_factures(
+            progress=lambda n: status_text.text(f"⏳ {n} documents supprimés…")
+        )
+        status_text.empty()
+        if result.failed:
+            st.error(f"⚠️ {len(result.failed)} suppression(s) en échec, relancez l'opération")
+        else:
+            st.warning(f"Toutes les factures ont été supprimées ({result.done} documents)")
+            st.experimental_rerun()
@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
-from matplotlib import pyplot as plt
 from streamlit_option_menu import option_menu
-from firebase_admin_setup import db
-from datetime import datetime
+from components.factures_repo import load_factures, load_unpaid, page_factures
+from components.payments import record_payment, PaymentError
+from components.pagination import paginated_table
+from components.factures_stats import user_kpis
+from components.live_sync import live_table
+from components.session import current_user, end_session
 
 # -------------------------------
 # Configuration générale
@@ -17,16 +19,18 @@ st.set_page_config(
 # -------------------------------
 # Sécurité session
 # -------------------------------
-if "authenticated" not in st.session_state:
-    st.session_state["authenticated"] = False
-
-if not st.session_state["authenticated"]:
+# jeton de session signé vérifié localement (pas de lecture Firestore)
+current = current_user()
+if current is None:
     st.error("⛔ Vous devez être connecté")
     st.switch_page("pages/Login.py")
     st.stop()
 
-user_id = st.session_state.get("user_id")
-role = st.session_state.get("role", "user")
+user_id = current["user_id"]
+role = current["role"]
+
+# pandas n'est chargé qu'une fois la session vérifiée (redirection vers Login plus rapide)
+import pandas as pd
 
 # -------------------------------
 # Sidebar navigation
@@ -62,6 +66,7 @@ elif selected == "👥 Utilisateurs":
     else:
         st.error("⛔ Accès réservé à l’administrateur")
 elif selected == "🔒 Déconnexion":
+    end_session()
     st.session_state.clear()
     st.success("✅ Déconnecté")
     st.switch_page("pages/Login.py")
@@ -74,42 +79,58 @@ st.title("📊 Gérer vos factures")
 # -------------------------------
 # Chargement des factures (USER UNIQUEMENT)
 # -------------------------------
-factures_ref = (
-    db.collection("factures")
-    .where("user_id", "==", user_id)
-    .stream()
+live = st.toggle(
+    "⚡ Temps réel",
+    key="live_sync",
+    help="Garde vos factures synchronisées en continu (modifications des autres caissiers incluses)",
 )
-
-rows = [doc.to_dict() | {"id": doc.id} for doc in factures_ref]
-df = pd.DataFrame(rows)
+if live:
+    # table locale tenue à jour par un listener Firestore : aucun aller-retour réseau au rerun
+    table = live_table("user", user_id)
+    try:
+        rows, live_version = table.snapshot()
+    except TimeoutError:
+        # réseau lent : on affiche la liste en cache ; la page se relance quand le listener répond
+        st.warning("⚠️ Synchronisation temps réel indisponible pour le moment : données du cache affichées")
+        rows, live_version = load_factures("user", user_id), table.version
+    st.session_state["live_version"] = live_version
+
+    def suivre_changements():
+        # relance la page dès que le listener a reçu des modifications
+        if table.version != st.session_state.get("live_version"):
+            st.rerun()
+
+    if hasattr(st, "fragment"):
+        st.fragment(run_every=2)(suivre_changements)()
+else:
+    # hors temps réel, aucune liste complète : pages, indicateurs et impayés sont lus à part
+    rows = None
 
 st.subheader("📄 Données chargées")
-st.dataframe(df, use_container_width=True)
+if live:
+    st.dataframe(sorted(rows, key=lambda r: str(r.get("date", "")), reverse=True), use_container_width=True)
+else:
+    # Pagination par curseur : seule la page affichée est lue dans Firestore
+    paginated_table(
+        "user_factures",
+        lambda size, cursor: page_factures("user", user_id, page_size=size, start_after=cursor),
+    )
 
 # -------------------------------
 # Aperçu global (vue utilisateur)
 # -------------------------------
 st.subheader("📊 Aperçu global")
 
-# Colonnes attendues pour les métriques utilisateur
-cols_needed = {"montant_total", "montant_paye", "reliquat", "status", "type"}
+# Totaux lus dans la synthèse ou calculés par Firestore (count / sum) : coût constant
+kpis = user_kpis(user_id)
 
-if df.empty:
+if not kpis["nb_factures"]:
     st.info("Aucune facture trouvée pour votre compte.")
 else:
-    # Normaliser les colonnes numériques si elles existent
-    if "montant_total" in df.columns:
-        df["montant_total"] = pd.to_numeric(df["montant_total"], errors="coerce").fillna(0)
-    if "montant_paye" in df.columns:
-        df["montant_paye"] = pd.to_numeric(df["montant_paye"], errors="coerce").fillna(0)
-    if "reliquat" in df.columns:
-        df["reliquat"] = pd.to_numeric(df["reliquat"], errors="coerce").fillna(0)
-
-    # Calculs sécurisés (utiliser 0 si colonne manquante)
-    nb_factures = int(df.shape[0])
-    total_montant_paye = float(df["montant_paye"].sum()) if "montant_paye" in df.columns else 0.0
-    total_montant_facture = float(df["montant_total"].sum()) if "montant_total" in df.columns else 0.0
-    total_reliquat = float(df["reliquat"].sum()) if "reliquat" in df.columns else 0.0
+    nb_factures = kpis["nb_factures"]
+    total_montant_paye = kpis["total_paye"]
+    total_montant_facture = kpis["total_facture"]
+    total_reliquat = kpis["total_reliquat"]
 
     # Affichage des métriques
     col1, col2, col3, col4 = st.columns(4)
@@ -118,49 +139,63 @@ else:
     col3.metric("📄 Total facturé", f"{total_montant_facture:,.0f} FCFA")
     col4.metric("❌ Total reliquat", f"{total_reliquat:,.0f} FCFA")
 
-    # Répartition des statuts si disponible
-    if "status" in df.columns:
+    # Répartition des statuts : synthèse, sinon un count() par statut (voir factures_stats)
+    if kpis.get("par_statut"):
         st.markdown("#### Répartition des statuts")
-        status_counts = df["status"].fillna("inconnu").value_counts().rename_axis("status").reset_index(name="count")
+        status_counts = pd.DataFrame(
+            sorted(kpis["par_statut"].items(), key=lambda kv: kv[1], reverse=True),
+            columns=["status", "count"],
+        )
         st.dataframe(status_counts, use_container_width=True)
     else:
         st.info("Le champ 'status' n'est pas disponible pour vos factures.")
 
-    # Optionnel : 5 dernières factures pour contexte
+    # Optionnel : 5 dernières factures pour contexte (une seule page de 5 lue)
     st.markdown("#### Dernières factures")
+    if live:
+        dernieres = sorted(rows, key=lambda r: str(r.get("date", "")), reverse=True)[:5]
+    else:
+        dernieres, _, _ = page_factures("user", user_id, page_size=5)
     cols_show = ["id", "date", "type", "client_name", "montant_total", "montant_paye", "reliquat", "status"]
-    cols_show = [c for c in cols_show if c in df.columns]
-    st.dataframe(df.sort_values(by="date", ascending=False).head(5)[cols_show].reset_index(drop=True), use_container_width=True)
+    st.dataframe(pd.DataFrame(dernieres).reindex(columns=cols_show), use_container_width=True)
 
 # Historique filtré + Impayés (sécurisé)
 # -------------------------------
 st.subheader("📑 Historique")
 
-# Vérifier qu'il y a des données et la colonne "type"
-if df.empty:
-    st.info("Aucune facture trouvée pour votre compte.")
-else:
-    if "type" not in df.columns:
-        st.info("Aucune donnée de type disponible dans l'historique.")
-    else:
-        filtre = st.selectbox(
-            "Filtrer par type",
-            ["Tous"] + sorted(df["type"].unique()),
-            key="filtre_type"
-        )
+# Filtre par type : appliqué par Firestore page par page (local en mode temps réel)
+filtre = st.selectbox(
+    "Filtrer par type",
+    ["Tous", "Facture de doit", "Reçu de Paiement"],
+    key="filtre_type"
+)
 
-        df_filtre = df if filtre == "Tous" else df[df["type"] == filtre]
-        st.dataframe(df_filtre, use_container_width=True)
+type_doc = None if filtre == "Tous" else filtre
+if live:
+    historique = [r for r in rows if type_doc is None or r.get("type") == type_doc]
+    st.dataframe(sorted(historique, key=lambda r: str(r.get("date", "")), reverse=True), use_container_width=True)
+else:
+    paginated_table(
+        "user_historique",
+        lambda size, cursor: page_factures("user", user_id, page_size=size, start_after=cursor, type_doc=type_doc),
+        signature=type_doc,
+    )
 
 # -------------------------------
 # Liste des impayés en tableau + sélection (safe)
 # -------------------------------
+if live:
+    impayes = pd.DataFrame([r for r in rows if float(r.get("reliquat", 0) or 0) > 0])
+else:
+    # filtre reliquat > 0 appliqué par Firestore : seules les factures impayées sont transférées
+    impayes = pd.DataFrame(load_unpaid("user", user_id))
 cols_needed = {"reliquat", "montant_paye", "montant_total", "client_name"}
-if not cols_needed.issubset(df.columns):
+if not impayes.empty and not cols_needed.issubset(impayes.columns):
     st.info("Les colonnes nécessaires pour afficher les impayés sont manquantes.")
 else:
-    # Définir impayes ici, même si l'utilisateur n'a aucune facture
-    impayes = df[df["reliquat"] > 0].copy()
+    for col in ["montant_total", "montant_paye", "reliquat"]:
+        if col in impayes.columns:
+            impayes[col] = pd.to_numeric(impayes[col], errors="coerce").fillna(0)
 
     st.subheader("❌ Factures impayées")
     if impayes.empty:
@@ -202,31 +237,13 @@ else:
             # Bouton Solder (dans le même scope que facture)
             # -------------------------------
             if st.button("Solder la facture sélectionnée", key=f"solder_selected_{facture['id']}"):
-                # calculer ici même
-                nouveau_montant_paye = float(facture.get("montant_paye", 0)) + float(montant_paye_input)
-                nouveau_reliquat = float(facture.get("montant_total", 0)) - nouveau_montant_paye
-                nouveau_reliquat = max(nouveau_reliquat, 0)
-
-                # mise à jour Firestore
-                doc_ref = db.collection("factures").document(facture["id"])
-                doc_ref.update({
-                    "montant_paye": nouveau_montant_paye,
-                    "reliquat": nouveau_reliquat,
-                    "status": "payée" if nouveau_reliquat == 0 else "partielle"
-                })
-
-                # Enregistrer le paiement dans une sous-collection 'paiements'
-                paiement_data = {
-                    "montant": float(montant_paye_input),
-                    "date": datetime.utcnow().isoformat(),
-                    "user_id": user_id,
-                    "mode": "manuel_user"
-                }
+                # facture relue et mise à jour dans une seule transaction (paiement + montants)
                 try:
-                    doc_ref.collection("paiements").add(paiement_data)
-                except Exception:
-                    # si l'API Firestore diffère, on ignore l'erreur d'ajout de paiement mais la facture est mise à jour
-                    pass
+                    paiement = record_payment(facture["id"], float(montant_paye_input), user_id=user_id, mode="manuel_user")
+                except PaymentError as e:
+                    st.error(f"⛔ {e}")
+                    st.stop()
+                nouveau_reliquat = paiement["reliquat"]
 
                 # Préparer la prévisualisation / génération PDF dans la page Previsualisation
                 st.session_state["preview_invoice_id"] = facture["id"]
@@ -235,7 +252,7 @@ else:
                 # afficher le message de succès ici (variables définies)
                 st.success(
                     f"Facture {facture['id']} mise à jour ✅ "
-                    f"(Payé: {int(nouveau_montant_paye)} CFA, Reliquat: {int(nouveau_reliquat)} CFA)"
+                    f"(Encaissé: {int(paiement['montant'])} CFA, Reliquat: {int(nouveau_reliquat)} CFA)"
                 )
 
                 # tentative de rerun ou redirection vers la page de prévisualisation
@@ -1,5 +1,5 @@
 import streamlit as st
-from firebase_utils import verify_user
+from components.session import current_user, start_session
 
 st.set_page_config(page_title="Connexion", layout="wide")
 
@@ -10,8 +10,8 @@ if "authenticated" not in st.session_state:
     st.session_state["email"] = None
     st.session_state["user_id"] = None
 
-# Si déjà connecté → redirection
-if st.session_state["authenticated"]:
+# Si déjà connecté (jeton de session valide) → redirection
+if current_user():
     st.switch_page("app.py")
     st.stop()
 
@@ -23,14 +23,15 @@ with st.form("login_form"):
     submit = st.form_submit_button("Se connecter")
 
     if submit:
+        # Firebase n'est importé / initialisé qu'à la soumission : le formulaire s'affiche sans attendre
+        from firebase_utils import verify_user
+
         # ⚡️ verify_user renvoie maintenant un dict {role, user_id, email}
         user_data = verify_user(email, password)
 
         if user_data:
-            st.session_state["authenticated"] = True
-            st.session_state["role"] = user_data["role"]
-            st.session_state["email"] = user_data["email"]
-            st.session_state["user_id"] = user_data["user_id"]
+            # une seule lecture Firestore à la connexion, aucune ensuite (session signée)
+            start_session(user_data)
 
             st.success(f"✅ Connecté en tant que {user_data['role']}")
             st.switch_page("app.py")
@@ -1,20 +1,17 @@
 import streamlit as st
-import sqlite3
 from datetime import datetime, date
 from streamlit_option_menu import option_menu
-from components.pdf_generator import generate_pdf, build_facture_html
-from firebase_admin_setup import db
+from components.pdf_jobs import job_queue, PENDING, RUNNING, DONE
+from components.factures_repo import get_facture, create_facture, update_facture
+from components.fetch import fetch_all
+from components.payments import list_paiements
+from components.session import current_user, end_session
 
 # -------------------------------
 # Vérification d'authentification
 # -------------------------------
-if "authenticated" not in st.session_state:
-    st.session_state["authenticated"] = False
-    st.session_state["role"] = None
-    st.session_state["email"] = None
-    st.session_state["user_id"] = None
-
-if not st.session_state["authenticated"]:
+# jeton de session signé vérifié localement (pas de lecture Firestore)
+if current_user() is None:
     st.warning("⚠️ Veuillez vous connecter d'abord.")
     st.switch_page("pages/Login.py")
     st.stop()
@@ -46,7 +43,7 @@ if selected == "🏠 Tableau de bord":
 elif selected == "👥 Utilisateurs":
     st.switch_page("pages/Admin.py")
 elif selected == "🔒 Déconnexion":
-    st.session_state["authenticated"] = False
+    end_session()
     st.info("✅ Déconnecté")
     st.switch_page("pages/Login.py")
 
@@ -59,34 +56,23 @@ st.title("📝 Prévisualisation")
 preview_id = st.session_state.get("preview_invoice_id")
 preview_pdf_flag = st.session_state.get("preview_generate_pdf", False)
 
-# Connexion DB locale (facultatif si tu utilises Firestore)
-conn = sqlite3.connect("data/factures.db")
-cursor = conn.cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS factures (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    type TEXT,
-    client TEXT,
-    montant REAL,
-    objet TEXT,
-    date TEXT
-)
-""")
-conn.commit()
-
-filename = None  # pour gérer l'envoi par email après génération
-
 # -------------------------------
 # Si preview_id est présent, charger la facture depuis Firestore
 # -------------------------------
 invoice_from_db = None
+paiements_facture = []
 if preview_id:
     try:
-        doc = db.collection("factures").document(preview_id).get()
-        if doc.exists:
-            invoice_from_db = doc.to_dict()
-            invoice_from_db["id"] = doc.id
-        else:
+        # facture et historique de ses paiements lus en parallèle
+        donnees, erreurs = fetch_all({
+            "facture": lambda: get_facture(preview_id),
+            "paiements": lambda: list_paiements(preview_id),
+        })
+        if "facture" in erreurs:
+            raise erreurs["facture"]
+        invoice_from_db = donnees["facture"]
+        paiements_facture = donnees.get("paiements", [])
+        if invoice_from_db is None:
             st.warning("La facture demandée pour prévisualisation est introuvable.")
             # nettoyer le flag pour éviter boucle
             st.session_state.pop("preview_invoice_id", None)
@@ -103,6 +89,12 @@ if preview_id:
 # -------------------------------
 if invoice_from_db:
     modele = invoice_from_db.get("type", "Facture de doit")
+    if paiements_facture:
+        with st.expander(f"💳 Paiements enregistrés ({len(paiements_facture)})"):
+            st.dataframe(
+                [{k: p.get(k) for k in ("date", "montant", "mode")} for p in paiements_facture],
+                use_container_width=True,
+            )
 else:
     modele = st.selectbox("Choisissez un modèle", ["Facture de doit", "Reçu de Paiement"])
 
@@ -184,7 +176,6 @@ if modele == "Facture de doit":
         "avance": avance,
         "reliquat": reliquat,
     }
-    html_preview = build_facture_html(data, type_doc="Facture de doit")
 
 # -------------------------------
 # Reçu
@@ -207,7 +198,17 @@ else:
         "montant_paye": montant_paye,
         "objet": objet
     }
-    html_preview = build_facture_html(data, type_doc="Reçu de Paiement")
+
+# -------------------------------
+# Profil de sortie : impression (qualité) ou email (fichier compact)
+# -------------------------------
+format_pdf = st.radio(
+    "Format du PDF",
+    ["🖨️ Impression", "📧 Email (compact)"],
+    horizontal=True,
+    key="pdf_profile"
+)
+pdf_profile = "email" if format_pdf.startswith("📧") else "print"
 
 # -------------------------------
 # Si la page a été appelée en preview depuis Data_analyse et preview_generate_pdf est True
@@ -229,17 +230,19 @@ if invoice_from_db and preview_pdf_flag:
         "avance": invoice_from_db.get("avance", invoice_from_db.get("montant_paye", 0.0)),
         "reliquat": invoice_from_db.get("reliquat", 0.0),
     }
-    html_preview_db = build_facture_html(invoice_data_for_pdf, type_doc=invoice_from_db.get("type", "Facture de doit"))
 
     if st.button("📄 Générer et télécharger le PDF de la facture mise à jour", key=f"download_preview_{invoice_from_db['id']}"):
-        filename = generate_pdf(html_preview_db, f"facture_{invoice_from_db['id']}.pdf")
-        if filename:
-            st.success("✅ PDF généré avec succès")
-            with open(filename, "rb") as f:
-                st.download_button("⬇️ Télécharger le PDF", f, file_name=filename, mime="application/pdf", key=f"dl_{invoice_from_db['id']}")
-            # nettoyer les flags de preview pour éviter régénération automatique
-            st.session_state.pop("preview_invoice_id", None)
-            st.session_state.pop("preview_generate_pdf", None)
+        # le rendu part en arrière-plan ; le suivi s'affiche en bas de page
+        st.session_state["pdf_job_id"] = job_queue.submit(
+            invoice_data_for_pdf,
+            invoice_from_db.get("type", "Facture de doit"),
+            filename=f"facture_{invoice_from_db['id']}.pdf",
+            owner=st.session_state["user_id"],
+            profile=pdf_profile,
+        )
+        # nettoyer les flags de preview pour éviter régénération automatique
+        st.session_state.pop("preview_invoice_id", None)
+        st.session_state.pop("preview_generate_pdf", None)
 
     st.markdown("---")
 
@@ -248,63 +251,110 @@ if invoice_from_db and preview_pdf_flag:
 # -------------------------------
 # Si la facture provient d'une prévisualisation existante, on évite de créer un nouveau document en base.
 if st.button("📄 Générer PDF"):
-    filename = generate_pdf(html_preview, "document.pdf")
-    if filename:
-        st.success("✅ PDF généré avec succès")
-
+    # Comme avant la file de rendu, le document n'est enregistré qu'une fois le PDF généré :
+    # l'écriture est confiée au job (on_done), faite côté serveur même si la page est quittée.
+    if invoice_from_db:
         # Si preview_id existe, on met à jour la facture existante au lieu d'en créer une nouvelle
-        if invoice_from_db:
-            doc_ref = db.collection("factures").document(invoice_from_db["id"])
-            # Mettre à jour les champs pertinents
-            update_payload = {
-                "client_name": data.get("client_name", ""),
-                "client_phone": data.get("client_phone", ""),
-                "client_email": data.get("client_email", ""),
-                "items": data.get("items", []),
-                "montant_total": data.get("montant_total", 0.0),
-                "montant_paye": data.get("montant_paye", 0.0),
-                "avance": data.get("avance", 0.0),
-                "reliquat": data.get("reliquat", 0.0),
-                "date": datetime.today().strftime("%Y-%m-%d"),
-            }
-            try:
-                doc_ref.update(update_payload)
-                st.success("💾 Facture mise à jour dans Firestore")
-            except Exception:
-                st.warning("⚠️ Impossible de mettre à jour la facture en base. Vérifiez la connexion.")
-
-            # proposer le téléchargement
-            with open(filename, "rb") as f:
-                st.download_button("⬇️ Télécharger le PDF", f, file_name=filename, mime="application/pdf")
-            # nettoyer flags preview
-            st.session_state.pop("preview_invoice_id", None)
-            st.session_state.pop("preview_generate_pdf", None)
+        update_payload = {
+            "client_name": data.get("client_name", ""),
+            "client_phone": data.get("client_phone", ""),
+            "client_email": data.get("client_email", ""),
+            "items": data.get("items", []),
+            "montant_total": data.get("montant_total", 0.0),
+            "montant_paye": data.get("montant_paye", 0.0),
+            "avance": data.get("avance", 0.0),
+            "reliquat": data.get("reliquat", 0.0),
+            "date": datetime.today().strftime("%Y-%m-%d"),
+        }
+
+        def enregistrer(facture_id=invoice_from_db["id"], payload=update_payload,
+                        owner_id=invoice_from_db.get("user_id")):
+            update_facture(facture_id, payload, user_id=owner_id)
+            return "💾 Facture mise à jour dans Firestore"
+
+        # nettoyer flags preview
+        st.session_state.pop("preview_invoice_id", None)
+        st.session_state.pop("preview_generate_pdf", None)
+    else:
+        # Créer une nouvelle facture dans Firestore
+        facture_doc = {
+            "type": modele,
+            "client_name": data.get("client_name", ""),
+            "client_phone": data.get("client_phone", ""),
+            "client_email": data.get("client_email", ""),
+            "items": data.get("items", []),
+            "objet": data.get("objet", ""),
+            "montant_total": data.get("montant_total", 0.0),
+            "montant_paye": data.get("montant_paye", 0.0),
+            "avance": data.get("avance", 0.0),
+            "reliquat": data.get("reliquat", 0.0),
+            "date": datetime.today().strftime("%Y-%m-%d"),
+            "user_id": st.session_state["user_id"],
+            "role": st.session_state.get("role", "user")
+        }
+
+        def enregistrer(doc=facture_doc):
+            create_facture(doc)
+            return "💾 Document enregistré dans Firestore"
+
+    st.session_state["pdf_job_id"] = job_queue.submit(
+        data,
+        modele,
+        filename=f"facture_{invoice_from_db['id']}.pdf" if invoice_from_db else "document.pdf",
+        owner=st.session_state["user_id"],
+        profile=pdf_profile,
+        on_done=enregistrer,
+    )
 
-        else:
-            # Créer une nouvelle facture dans Firestore
-            facture_doc = {
-                "type": modele,
-                "client_name": data.get("client_name", ""),
-                "client_phone": data.get("client_phone", ""),
-                "client_email": data.get("client_email", ""),
-                "items": data.get("items", []),
-                "objet": data.get("objet", ""),
-                "montant_total": data.get("montant_total", 0.0),
-                "montant_paye": data.get("montant_paye", 0.0),
-                "avance": data.get("avance", 0.0),
-                "reliquat": data.get("reliquat", 0.0),
-                "date": datetime.today().strftime("%Y-%m-%d"),
-                "user_id": st.session_state["user_id"],
-                "role": st.session_state.get("role", "user")
-            }
-
-            try:
-                db.collection("factures").add(facture_doc)
-                st.success("💾 Document enregistré dans Firestore")
-            except Exception:
-                st.warning("⚠️ Impossible d'enregistrer la facture en base. Vérifiez la connexion.")
-
-            with open(filename, "rb") as f:
-                st.download_button("⬇️ Télécharger le PDF", f, file_name=filename, mime="application/pdf")
-
-conn.close()
+
+# -------------------------------
+# Suivi du rendu PDF en arrière-plan
+# -------------------------------
+def _job_en_cours():
+    job_id = st.session_state.get("pdf_job_id")
+    job = job_queue.get(job_id, owner=st.session_state["user_id"]) if job_id else None
+    return job is not None and job.status in (PENDING, RUNNING)
+
+
+def suivre_job_pdf():
+    job_id = st.session_state.get("pdf_job_id")
+    if not job_id:
+        return
+    job = job_queue.get(job_id, owner=st.session_state["user_id"])
+    if job is None:
+        # job expiré : on oublie l'identifiant
+        st.session_state.pop("pdf_job_id", None)
+        return
+
+    status = job.status
+    if status in (PENDING, RUNNING):
+        # étape réelle du job (en file / en cours) plutôt qu'un pourcentage inventé
+        st.info("⏳ Génération du PDF en cours…" if status == RUNNING else "🕒 PDF en file d'attente…")
+        if _fragment is None and st.button("🔄 Actualiser", key="pdf_job_refresh"):
+            st.rerun()
+    elif st.session_state.get("_pdf_job_polling"):
+        # job terminé pendant le suivi : relance de toute la page, qui n'enregistre plus
+        # le fragment périodique (plus d'interrogation chaque seconde)
+        st.session_state["_pdf_job_polling"] = False
+        st.rerun()
+    elif status == DONE:
+        if job.save_error:
+            st.warning("⚠️ Impossible d'enregistrer la facture en base. Vérifiez la connexion.")
+        elif job.saved:
+            st.success(job.saved)
+        st.success("✅ PDF généré avec succès")
+        st.download_button("⬇️ Télécharger le PDF", job.result, file_name=job.filename, mime="application/pdf", key=f"dl_{job.id}")
+    else:
+        # PDF non généré : rien n'a été enregistré en base
+        st.error(f"❌ Échec de la génération du PDF {job.error or ''}")
+
+
+# st.fragment relance uniquement ce bloc (toutes les secondes) sans bloquer le reste de la page,
+# et seulement tant qu'un rendu est en file ou en cours
+_fragment = getattr(st, "fragment", None)
+if _fragment is not None and _job_en_cours():
+    st.session_state["_pdf_job_polling"] = True
+    _fragment(run_every=1)(suivre_job_pdf)()
+else:
+    st.session_state["_pdf_job_polling"] = False
+    suivre_job_pdf()
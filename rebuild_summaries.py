@@ -0,0 +1,106 @@
+"""
+Recalcule les documents de synthèse (collection "stats") à partir des factures.
+
+Les synthèses sont tenues à jour à chaque écriture faite par l'application ; ce
+script corrige une dérive éventuelle (écritures faites hors de l'application,
+import, suppression manuelle…). Sans --apply, il affiche seulement les écarts.
+À lancer de préférence hors des heures d'encaissement : une écriture faite pendant
+le recalcul peut laisser un petit écart, corrigé au passage suivant.
+À lancer avec --apply après le déploiement : tant qu'une synthèse n'a pas été
+construite ici (champ version), les tableaux de bord s'en passent (agrégations).
+Les anciennes factures sans champ reliquat (comptées comme soldées) reçoivent
+reliquat = 0 au passage, sans quoi le filtre "Payées" de l'export les ignore.
+
+    python rebuild_summaries.py            # rapport des écarts
+    python rebuild_summaries.py --apply    # réécrit les synthèses
+"""
+import argparse
+
+from firebase_admin_setup import db
+from components import bulk_ops
+from components.factures_repo import COLLECTION, invalidate_factures
+from firebase_admin import firestore
+from components.summaries import FIELDS, STATS_COLLECTION, compute_summaries
+
+
+def _flatten(doc, prefix=""):
+    flat = {}
+    for key, value in (doc or {}).items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def diff(current, expected):
+    current, expected = _flatten(current), _flatten(expected)
+    return {
+        key: (current.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(current) | set(expected))
+        if abs(current.get(key, 0) - expected.get(key, 0)) > 0.01
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="réécrit les synthèses recalculées")
+    args = parser.parse_args()
+
+    # seuls les champs utiles aux synthèses sont transférés
+    sans_reliquat = []
+
+    def factures():
+        for doc in db.collection(COLLECTION).select(FIELDS).stream():
+            data = doc.to_dict()
+            if "reliquat" not in data:
+                sans_reliquat.append(doc.reference)
+            yield data
+
+    expected = compute_summaries(factures())
+    current = {doc.id: doc.to_dict() for doc in db.collection(STATS_COLLECTION).stream()}
+
+    obsolete = sorted(set(current) - set(expected))
+    drift = {doc_id: diff(current.get(doc_id), values) for doc_id, values in expected.items()}
+    drift = {doc_id: d for doc_id, d in drift.items() if d}
+
+    for doc_id, fields in drift.items():
+        print(f"⚠️ {doc_id}")
+        for key, (got, want) in fields.items():
+            print(f"    {key}: {got} → {want}")
+    for doc_id in obsolete:
+        print(f"⚠️ {doc_id} : plus aucune facture, synthèse à supprimer")
+    if sans_reliquat:
+        print(f"⚠️ {len(sans_reliquat)} facture(s) sans champ reliquat")
+    if not drift and not obsolete and not sans_reliquat:
+        print(f"✅ {len(expected)} synthèse(s) à jour")
+        return
+
+    if not args.apply:
+        print("Relancez avec --apply pour corriger")
+        return
+
+    if sans_reliquat:
+        # absent = soldée (valeur lue par défaut partout) : la requête reliquat <= 0 les retrouve
+        result = bulk_ops.update_documents((ref, {"reliquat": 0}) for ref in sans_reliquat)
+        print(f"✅ reliquat = 0 ajouté à {result.done} facture(s)")
+
+    stats = db.collection(STATS_COLLECTION)
+    batch, pending = db.batch(), 0
+    for doc_id in list(drift) + obsolete:
+        if doc_id in expected:
+            # built_at + version : la synthèse est désormais lue par les tableaux de bord
+            batch.set(stats.document(doc_id), expected[doc_id] | {"built_at": firestore.SERVER_TIMESTAMP})
+        else:
+            batch.delete(stats.document(doc_id))
+        pending += 1
+        if pending == 400:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    batch.commit()
+    invalidate_factures()
+    print(f"✅ {len(drift) + len(obsolete)} synthèse(s) corrigée(s)")
+
+
+if __name__ == "__main__":
+    main()